@@ -1,43 +1,71 @@
 from uuid import uuid1 as generateUuid
 import sys
-import cv2
 import numpy as np
 import time
 import math
-
-# main data class for positioning
+import threading
+import queue
+import importlib
+import concurrent.futures
+import json
+import pickle
+import gc
+import os
+import functools
+import tempfile
+import shutil
+import weakref
+from collections import deque
+
+cv2 = None      # opencv, only imported once a RendererCv is created so headless simulations do not load it
+
+def ImportCv2():
+    global cv2
+    if cv2 == None:
+        import cv2 as cv2Module
+        cv2 = cv2Module
+    return cv2
+
+# main data class for positioning, the in place operators (+=, -=, *=, /=) change the Vec itself instead of creating a new one
 class Vec:
+    __slots__ = ("x", "y", "z")
+
     def __init__(self, _x=0, _y=0, _z=0):
         self.x = _x
         self.y = _y
         self.z = _z
 
     def getRotatedVecZ(self, _angle=0):
-        newX = math.cos(_angle) * self.x - math.sin(_angle) * self.y
-        newY = math.sin(_angle) * self.x + math.cos(_angle) * self.y
-        newZ = self.z
-        return Vec(newX, newY, newZ)
+        c, s = math.cos(_angle), math.sin(_angle)
+        return Vec(c * self.x - s * self.y, s * self.x + c * self.y, self.z)
     
     def getRotatedVecY(self, _angle=0):
-        newX = math.cos(_angle) * self.x + math.sin(_angle) * self.z
-        newY = self.y
-        newZ = math.sin(_angle) * (-self.x) + math.cos(_angle) * self.z
-        return Vec(newX, newY, newZ)
+        c, s = math.cos(_angle), math.sin(_angle)
+        return Vec(c * self.x + s * self.z, self.y, s * (-self.x) + c * self.z)
 
     def getRotatedVecX(self, _angle=0):
-        newX = self.x
-        newY = math.cos(_angle) * self.y - math.sin(_angle) * self.z
-        newZ = math.sin(_angle) * self.y + math.cos(_angle) * self.z
-        return Vec(newX, newY, newZ)
+        c, s = math.cos(_angle), math.sin(_angle)
+        return Vec(self.x, c * self.y - s * self.z, s * self.y + c * self.z)
 
     def getRotatedVec(self, _rotationX, _rotationY, _rotationZ):
-        return self.getRotatedVecZ(_rotationZ).getRotatedVecY(_rotationY).getRotatedVecX(_rotationX)
+        return GetRotation(_rotationX, _rotationY, _rotationZ).apply(self)
+
+    def assign(self, _vec):
+        # copies the components of another Vec into this one
+        self.x = _vec.x
+        self.y = _vec.y
+        self.z = _vec.z
+
+    def copy(self):
+        return Vec(self.x, self.y, self.z)
 
     def __getitem__(self, _key):
         if _key == 0:
             return self.x
         if _key == 1:
             return self.y
+        if _key == 2:
+            return self.z
         return None
 
     def __setitem__(self, _key, _item):
@@ -45,6 +73,8 @@ class Vec:
             self.x = _item
         if _key == 1:
             self.y = _item
+        if _key == 2:
+            self.z = _item
     
     def __add__(self, _vec):
         return Vec(self.x + _vec.x, self.y + _vec.y, self.z + _vec.z)
@@ -58,9 +88,156 @@ class Vec:
     def __mul__(self, _num):
         return Vec(self.x * _num, self.y * _num, self.z * _num)
 
+    def __iadd__(self, _vec):
+        self.x += _vec.x
+        self.y += _vec.y
+        self.z += _vec.z
+        return self
+
+    def __isub__(self, _vec):
+        self.x -= _vec.x
+        self.y -= _vec.y
+        self.z -= _vec.z
+        return self
+
+    def __imul__(self, _num):
+        self.x *= _num
+        self.y *= _num
+        self.z *= _num
+        return self
+
+    def __itruediv__(self, _num):
+        self.x /= _num
+        self.y /= _num
+        self.z /= _num
+        return self
+
     def __str__(self):
         return str(self.x) + "," + str(self.y) + "," + str(self.z)
 
+# A rotation by angles around x, y and z (like entity rotations) with the sines and cosines computed once, applied to many Vecs.
+# apply gives the same result as Vec.getRotatedVec (z first, then y, then x), get one through the cache of GetRotation
+class Rotation:
+    __slots__ = ("angles", "cX", "sX", "cY", "sY", "cZ", "sZ", "matrix")
+
+    def __init__(self, _rotationX=0, _rotationY=0, _rotationZ=0):
+        self.angles = (_rotationX, _rotationY, _rotationZ)
+        self.cX, self.sX = math.cos(_rotationX), math.sin(_rotationX)
+        self.cY, self.sY = math.cos(_rotationY), math.sin(_rotationY)
+        self.cZ, self.sZ = math.cos(_rotationZ), math.sin(_rotationZ)
+        self.matrix = None                      # the 3x3 numpy matrix, made on first use
+
+    def apply(self, _vec):
+        # rotates around z, then y, then x
+        x = self.cZ * _vec.x - self.sZ * _vec.y
+        y = self.sZ * _vec.x + self.cZ * _vec.y
+        x, z = self.cY * x + self.sY * _vec.z, self.sY * (-x) + self.cY * _vec.z
+        return Vec(x, self.cX * y - self.sX * z, self.sX * y + self.cX * z)
+
+    def applyInverse(self, _vec):
+        # undoes apply, rotating back around x, then y, then z
+        y = self.cX * _vec.y + self.sX * _vec.z
+        z = -self.sX * _vec.y + self.cX * _vec.z
+        x, z = self.cY * _vec.x - self.sY * z, -self.sY * (-_vec.x) + self.cY * z
+        return Vec(self.cZ * x + self.sZ * y, -self.sZ * x + self.cZ * y, z)
+
+    def getMatrix(self):
+        # the matrix doing the same as apply, do not modify
+        if self.matrix is None:
+            rotX = np.array([[1, 0, 0], [0, self.cX, -self.sX], [0, self.sX, self.cX]])
+            rotY = np.array([[self.cY, 0, self.sY], [0, 1, 0], [-self.sY, 0, self.cY]])
+            rotZ = np.array([[self.cZ, -self.sZ, 0], [self.sZ, self.cZ, 0], [0, 0, 1]])
+            self.matrix = rotX @ rotY @ rotZ
+        return self.matrix
+
+@functools.lru_cache(maxsize=4096)
+def GetRotation(_rotationX, _rotationY, _rotationZ):
+    # the shared Rotation of the given angles, entities mostly keep their rotation so it is computed once
+    return Rotation(_rotationX, _rotationY, _rotationZ)
+
+# the position or rotation of an entity, tells the entity (Entity.poseChanged) whenever a component is changed
+class EntityVec(Vec):
+    __slots__ = ("owner",)
+
+    def __init__(self, _owner, _x=0, _y=0, _z=0):
+        self.owner = None
+        Vec.__init__(self, _x, _y, _z)
+        self.owner = _owner
+
+    def __reduce__(self):
+        return (EntityVec, (self.owner, self.x, self.y, self.z))
+
+    def setX(self, _value):
+        Vec.x.__set__(self, _value)
+        if self.owner != None:
+            self.owner.poseChanged()
+
+    def setY(self, _value):
+        Vec.y.__set__(self, _value)
+        if self.owner != None:
+            self.owner.poseChanged()
+
+    def setZ(self, _value):
+        Vec.z.__set__(self, _value)
+        if self.owner != None:
+            self.owner.poseChanged()
+
+    x = property(Vec.x.__get__, setX)
+    y = property(Vec.y.__get__, setY)
+    z = property(Vec.z.__get__, setZ)
+
+    def assign(self, _vec):
+        Vec.x.__set__(self, _vec.x)
+        Vec.y.__set__(self, _vec.y)
+        Vec.z.__set__(self, _vec.z)
+        if self.owner != None:
+            self.owner.poseChanged()
+
+# a Vec whose components live in a row of a numpy array, used for entities kept in an EntityStateStore
+class VecView(Vec):
+    __slots__ = ("array", "index", "owner")
+
+    def __init__(self, _array, _index, _owner=None):
+        self.array = _array                     # the (N,3) array holding the values, swapped by the store when it grows
+        self.index = _index                     # the row of the array
+        self.owner = _owner                     # the entity told about changes (Entity.poseChanged), None for the velocity
+
+    def __reduce__(self):
+        return (VecView, (self.array, self.index, self.owner))
+
+    def getX(self):
+        return self.array[self.index, 0]
+
+    def setX(self, _value):
+        self.array[self.index, 0] = _value
+        if self.owner != None:
+            self.owner.poseChanged()
+
+    def getY(self):
+        return self.array[self.index, 1]
+
+    def setY(self, _value):
+        self.array[self.index, 1] = _value
+        if self.owner != None:
+            self.owner.poseChanged()
+
+    def getZ(self):
+        return self.array[self.index, 2]
+
+    def setZ(self, _value):
+        self.array[self.index, 2] = _value
+        if self.owner != None:
+            self.owner.poseChanged()
+
+    x = property(getX, setX)
+    y = property(getY, setY)
+    z = property(getZ, setZ)
+
+    def assign(self, _vec):
+        self.array[self.index] = (_vec.x, _vec.y, _vec.z)
+        if self.owner != None:
+            self.owner.poseChanged()
+
 # utility functions for Vec
 def InterpolatePositionsBetweenPoints(_vec1, _vec2, _points=5):
     positions = []
@@ -68,7 +245,7 @@ def InterpolatePositionsBetweenPoints(_vec1, _vec2, _points=5):
     step_y = (_vec2.y - _vec1.y) / _points
     step_z = (_vec2.z - _vec1.z) / _points
     for n in range(1, _points-1):
-        positions.append(_vec1 + Vec(step_x * n, step_y * n, step_z * n))
+        positions.append(Vec(_vec1.x + step_x * n, _vec1.y + step_y * n, _vec1.z + step_z * n))
     return positions
 
 def CalcTriangleSignArea(_pos1, _pos2, _pos3):
@@ -80,57 +257,274 @@ def IsPositionWithinTriangle(_position, _trianglePos1, _trianglePos2, _triangleP
     a3 = CalcTriangleSignArea(_position, _trianglePos3, _trianglePos1)
     return (a1 < 0) == (a2 < 0) and (a2 < 0) == (a3 < 0)
 
+# utility functions for batches of positions stored as numpy arrays
+def GetRotationMatrix(_rotationX, _rotationY, _rotationZ):
+    # matrix doing the same as Vec.getRotatedVec (z first, then y, then x), a copy so the caller may modify it
+    return GetRotation(_rotationX, _rotationY, _rotationZ).getMatrix().copy()
+
+def VecsToArray(_positions):
+    # accepts a list of Vec or an (N,3) array and returns an (N,3) float array
+    if isinstance(_positions, np.ndarray):
+        return _positions.reshape(-1, 3).astype(np.float64, copy=False)
+    return np.array([(position.x, position.y, position.z) for position in _positions], np.float64).reshape(-1, 3)
+
+def PositionsMeetHitBoxes(_positions, _worldPositions, _rotations, _lowerBounds, _upperBounds, _maxElements=1 << 20):
+    # returns a (N,M) hit matrix for N positions against M oriented boxes, each box given by its world position,
+    # its rotation matrix and its local bounds, the positions are rotated back into box space with the transposed matrices
+    hits = np.zeros((len(_positions), len(_worldPositions)), bool)
+    if len(_positions) == 0 or len(_worldPositions) == 0:
+        return hits
+    step = max(1, _maxElements // len(_worldPositions))
+    for start in range(0, len(_positions), step):
+        difference = _positions[start:start + step, None, :] - _worldPositions[None, :, :]
+        local = np.einsum('mji,nmj->nmi', _rotations, difference)
+        hits[start:start + step] = np.all((local >= _lowerBounds) & (local <= _upperBounds), axis=2)
+    return hits
+
+def OrientedBoxSeparations(_centerA, _rotationA, _halfExtentsA, _centersB, _rotationsB, _halfExtentsB):
+    # separating axis test of box A against K boxes B, the box axes are the columns of the rotation matrices
+    # returns the separation per box B (negative is the penetration depth) and the normal of that axis pointing from A to B
+    count = len(_centersB)
+    axesA = np.broadcast_to(_rotationA.T, (count, 3, 3))
+    axesB = np.transpose(_rotationsB, (0, 2, 1))
+    edgeAxes = np.cross(axesA[:, :, None, :], axesB[:, None, :, :]).reshape(count, 9, 3)
+    axes = np.concatenate([axesA, axesB, edgeAxes], axis=1)
+
+    # edge axes of parallel edges vanish and can not separate
+    lengths = np.linalg.norm(axes, axis=2)
+    validAxes = lengths > 1e-9
+    axes = axes / np.where(validAxes, lengths, 1)[:, :, None]
+
+    distances = np.einsum('kaj,kj->ka', axes, _centersB - _centerA)
+    radiusA = np.abs(np.einsum('kaj,kij->kai', axes, axesA)) @ _halfExtentsA
+    radiusB = np.einsum('kai,ki->ka', np.abs(np.einsum('kaj,kij->kai', axes, axesB)), _halfExtentsB)
+    gaps = np.where(validAxes, np.abs(distances) - radiusA - radiusB, -np.inf)
+
+    best = np.argmax(gaps, axis=1)
+    rows = np.arange(count)
+    separations = gaps[rows, best]
+    normals = axes[rows, best] * np.where(distances[rows, best] < 0, -1, 1)[:, None]
+    return separations, normals
+
+def GetContactDirection(_normal):
+    # the blocked direction (index in EntityStateStore.blockedNames) of a contact normal pointing away from the entity
+    axis = int(np.argmax(np.abs(_normal)))
+    if axis == 1:
+        return 0 if _normal[1] > 0 else 1
+    if axis == 0:
+        return 3 if _normal[0] > 0 else 2
+    return 5 if _normal[2] > 0 else 4
+
+def SweptBoxTimesOfImpact(_center, _halfExtents, _displacement, _centers, _rotations, _halfExtentsB):
+    # sweeps an axis aligned box along a displacement against K oriented boxes, the moving box is grown onto the axes of each
+    # oriented box so the sweep becomes a ray test in box space. Returns the time of impact per box (inf if not hit or already
+    # overlapping at the start) and the world normal of the face hit, pointing out of the box
+    localCenters = np.einsum('kji,kj->ki', _rotations, _center - _centers)
+    localDisplacements = np.einsum('kji,j->ki', _rotations, _displacement)
+    extents = _halfExtentsB + np.einsum('kji,j->ki', np.abs(_rotations), _halfExtents)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inverse = 1 / localDisplacements
+        timesA = (-extents - localCenters) * inverse
+        timesB = (extents - localCenters) * inverse
+    moving = localDisplacements != 0
+    inside = np.abs(localCenters) <= extents
+    timesEnter = np.where(moving, np.minimum(timesA, timesB), np.where(inside, -np.inf, np.inf))
+    timesExit = np.where(moving, np.maximum(timesA, timesB), np.where(inside, np.inf, -np.inf))
+
+    axes = np.argmax(timesEnter, axis=1)
+    rows = np.arange(len(_centers))
+    enter = timesEnter[rows, axes]
+    exit = np.min(timesExit, axis=1)
+    hits = (enter >= 0) & (enter <= 1) & (enter <= exit)
+    times = np.where(hits, enter, np.inf)
+    normals = _rotations[rows, :, axes] * -np.sign(localDisplacements[rows, axes])[:, None]
+    return times, normals
+
+def RaysHitBoxes(_origins, _directions, _maxDistances, _centers, _rotations, _halfExtents, _maxElements=1 << 20):
+    # casts N rays (unit directions) against M oriented boxes with the slab test in box space, returns per ray the distance to the
+    # first box hit (inf if none), its index (-1 if none) and the world normal of the face hit. Rays starting inside a box hit it at
+    # distance 0 with the normal against the ray, on equal distances the lowest box index wins
+    count = len(_origins)
+    distances = np.full(count, np.inf)
+    indices = np.full(count, -1, np.intp)
+    normals = np.zeros((count, 3))
+    if count == 0 or len(_centers) == 0:
+        return distances, indices, normals
+    step = max(1, _maxElements // len(_centers))
+    for start in range(0, count, step):
+        end = min(count, start + step)
+        localOrigins = np.einsum('mji,nmj->nmi', _rotations, _origins[start:end, None, :] - _centers[None, :, :])
+        localDirections = np.einsum('mji,nj->nmi', _rotations, _directions[start:end])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse = 1 / localDirections
+            timesA = (-_halfExtents - localOrigins) * inverse
+            timesB = (_halfExtents - localOrigins) * inverse
+        moving = localDirections != 0
+        inside = np.abs(localOrigins) <= _halfExtents
+        timesEnter = np.where(moving, np.minimum(timesA, timesB), np.where(inside, -np.inf, np.inf))
+        timesExit = np.where(moving, np.maximum(timesA, timesB), np.where(inside, np.inf, -np.inf))
+
+        axes = np.argmax(timesEnter, axis=2)
+        enter = np.take_along_axis(timesEnter, axes[:, :, None], axis=2)[:, :, 0]
+        exit = np.min(timesExit, axis=2)
+        hits = (enter <= exit) & (exit >= 0) & (enter <= _maxDistances[start:end, None])
+        hitDistances = np.where(hits, np.maximum(enter, 0), np.inf)
+
+        best = np.argmin(hitDistances, axis=1)
+        rows = np.arange(end - start)
+        distances[start:end] = hitDistances[rows, best]
+        hit = np.isfinite(distances[start:end])
+        indices[start:end] = np.where(hit, best, -1)
+        bestAxes = axes[rows, best]
+        faceNormals = _rotations[best, :, bestAxes] * -np.sign(localDirections[rows, best, bestAxes])[:, None]
+        startedInside = enter[rows, best] < 0
+        normals[start:end] = np.where(hit[:, None], np.where(startedInside[:, None], -_directions[start:end], faceNormals), 0)
+    return distances, indices, normals
+
+def SpheresMeetHitBoxes(_centers, _radii, _boxCenters, _rotations, _halfExtents, _maxElements=1 << 20):
+    # returns the (N,M) overlap matrix of N spheres against M oriented boxes, using the point of each box closest to the sphere center
+    hits = np.zeros((len(_centers), len(_boxCenters)), bool)
+    if len(_centers) == 0 or len(_boxCenters) == 0:
+        return hits
+    step = max(1, _maxElements // len(_boxCenters))
+    for start in range(0, len(_centers), step):
+        local = np.einsum('mji,nmj->nmi', _rotations, _centers[start:start + step, None, :] - _boxCenters[None, :, :])
+        outside = local - np.clip(local, -_halfExtents, _halfExtents)
+        hits[start:start + step] = np.einsum('nmi,nmi->nm', outside, outside) <= (_radii[start:start + step, None] ** 2)
+    return hits
+
+# A touching or overlapping pair of hitboxes found by the narrowphase
+class Contact:
+    def __init__(self, _entity, _hitBox, _otherEntity, _otherHitBox, _normal, _depth):
+        self.entity = _entity
+        self.hitBox = _hitBox
+        self.otherEntity = _otherEntity
+        self.otherHitBox = _otherHitBox
+        self.normal = _normal                   # unit Vec pointing from the entity towards the other entity
+        self.depth = _depth                     # penetration depth, negative while the boxes are apart but within the contact margin
+        self.direction = GetContactDirection((_normal.x, _normal.y, _normal.z))
+
 # A hitbox/rectangle used to detect collision
 class HitBox:
+    # sign of each corner along x, y and z in the order of getBoundingRect
+    cornerSigns = np.array([[-1, -1, -1], [1, -1, -1], [-1, 1, -1], [1, 1, -1], [-1, -1, 1], [1, -1, 1], [-1, 1, 1], [1, 1, 1]])
+    # corner pairs interpolated for the contact probes of each face (bottom, top, left, right, front, back), the same edges as getCollisionPositions used
+    probeEdges = [[(2, 3), (2, 2), (3, 7), (7, 6)], [(0, 1), (0, 0), (1, 5), (5, 4)], [(0, 2), (4, 6)], [(1, 3), (4, 6)], [(0, 2), (1, 3)], [(4, 6), (5, 7)]]
+
     def __init__(self, _name, _ownerId, _shape, _relativePos=Vec(0,0,0), _relativeRot=Vec(0,0,0)):
         self.ownerId = _ownerId                 # id of entity
-        self.shape = _shape                     # the width and height of the hitbox
-        self.relativePos = _relativePos         # the position of the hitbox relative to origin (0,0)
-        self.relativeRot = _relativeRot
+        self.owner = None                       # the entity holding the hitbox, told when the hitbox gets edited (Entity.poseChanged)
+        self.shape = _shape.copy()              # the width and height of the hitbox, own copies as Vecs may be changed in place
+        self.relativePos = _relativePos.copy()  # the position of the hitbox relative to origin (0,0)
+        self.relativeRot = _relativeRot.copy()
         self.name = _name                       # the name of the hitbox
         self.halfExtents = (self.shape/2)
 
+        self.version = 0                        # increased by editHitBox, invalidates the cached geometry
+        self.rotationKey = None                 # the rotation and version the cached rotation matrix was made for
+        self.rotationMatrix = None
+        self.geometryCache = {}                 # offset -> [pose key, corners array, corner tuples, bounds tuples], filled on demand
+        self.probeCache = {}                    # (points, offset) -> [version, local probes array, points per face], filled on demand
+
+    def __getstate__(self):
+        # the cached geometry is left out when pickling
+        state = self.__dict__.copy()
+        state["rotationKey"] = None
+        state["rotationMatrix"] = None
+        state["geometryCache"] = {}
+        state["probeCache"] = {}
+        return state
+
     def editHitBox(self, _relativePos=None, _relativeRot=None, _shape=None):
         if _relativePos != None:
-            self.relativePos = _relativePos
+            self.relativePos = _relativePos.copy()
         if _relativeRot != None:
-            self.relativeRot = _relativePos
+            self.relativeRot = _relativeRot.copy()
         if _shape != None:
-            self.shape = _shape
+            self.shape = _shape.copy()
+            self.halfExtents = (self.shape/2)
+        self.version += 1
+        if self.owner != None:
+            # the scene rewrites the hitbox in its indices before the next query
+            self.owner.poseChanged()
+
+    def getRotationMatrix(self, _worldRotation=Vec(0,0,0)):
+        # the composed rotation of hitbox and owner, only recomputed when the rotation or the hitbox changed
+        key = (_worldRotation.x, _worldRotation.y, _worldRotation.z, self.version)
+        if key != self.rotationKey:
+            self.rotationMatrix = GetRotation(self.relativeRot.x + _worldRotation.x, self.relativeRot.y + _worldRotation.y, self.relativeRot.z + _worldRotation.z).getMatrix()
+            self.rotationKey = key
+        return self.rotationMatrix
+
+    def getGeometry(self, _worldPosition, _worldRotation, _offset):
+        # returns the cache entry [key, corners array, corner tuples, bounds tuples] of the given offset, rebuilding it when the owner moved or the hitbox changed
+        key = (_worldPosition.x, _worldPosition.y, _worldPosition.z, _worldRotation.x, _worldRotation.y, _worldRotation.z, self.version)
+        offsetKey = (_offset.x, _offset.y, _offset.z)
+        entry = self.geometryCache.get(offsetKey)
+        if entry != None and entry[0] == key:
+            return entry
+
+        lowerBound = self.relativePos - self.halfExtents - _offset
+        upperBound = self.relativePos + self.halfExtents + _offset
+        local = np.where(self.cornerSigns < 0, (lowerBound.x, lowerBound.y, lowerBound.z), (upperBound.x, upperBound.y, upperBound.z))
+        corners = local @ self.getRotationMatrix(_worldRotation).T + (_worldPosition.x, _worldPosition.y, _worldPosition.z)
+        corners.flags.writeable = False
+        entry = [key, corners, None, None]
+        self.geometryCache[offsetKey] = entry
+        return entry
+
+    def getProbeTemplate(self, _points=5, _offset=Vec(0,0,0)):
+        # the contact probes in hitbox space (before the rotation and position of the owner) as (N,3) array grouped by face and the
+        # number of probes per face, only rebuilt when the hitbox got edited
+        key = (_points, _offset.x, _offset.y, _offset.z)
+        entry = self.probeCache.get(key)
+        if entry != None and entry[0] == self.version:
+            return entry[1], entry[2]
+
+        lowerBound = self.relativePos - self.halfExtents - _offset
+        upperBound = self.relativePos + self.halfExtents + _offset
+        local = np.where(self.cornerSigns < 0, (lowerBound.x, lowerBound.y, lowerBound.z), (upperBound.x, upperBound.y, upperBound.z))
+        steps = np.arange(1, _points - 1, dtype=np.float64)[None, :, None]
+        probes = []
+        faceCounts = []
+        for edges in self.probeEdges:
+            starts = local[[edge[0] for edge in edges]][:, None, :]
+            ends = local[[edge[1] for edge in edges]][:, None, :]
+            # same arithmetic as InterpolatePositionsBetweenPoints
+            probes.append((starts + (ends - starts) / _points * steps).reshape(-1, 3))
+            faceCounts.append(len(probes[-1]))
+        entry = [self.version, np.concatenate(probes), faceCounts]
+        self.probeCache[key] = entry
+        return entry[1], entry[2]
+
+    def getWorldCorners(self, _worldPosition=Vec(0,0,0), _worldRotation=Vec(0,0,0), _offset=Vec(0,0,0)):
+        # the corners as (8,3) array in the order of getBoundingRect, do not modify
+        return self.getGeometry(_worldPosition, _worldRotation, _offset)[1]
 
     def getBoundingRect(self, _worldPosition=Vec(0,0,0), _worldRotation=Vec(0,0,0), _offset=Vec(0,0,0)):
-        self.halfExtents = (self.shape/2)
-
-        f_leftTop = self.relativePos - self.halfExtents - _offset
-        b_rightBot = self.relativePos + self.halfExtents + _offset
-
-        f_rightTop = Vec(b_rightBot.x, f_leftTop.y, f_leftTop.z)
-        f_leftBot = Vec(f_leftTop.x, b_rightBot.y, f_leftTop.z)
-        f_rightBot = Vec(b_rightBot.x, b_rightBot.y, f_leftTop.z)
-
-        b_leftTop = Vec(f_leftTop.x, f_leftTop.y, b_rightBot.z)
-        b_rightTop = Vec(b_rightBot.x, f_leftTop.y, b_rightBot.z)
-        b_leftBot = Vec(f_leftTop.x, b_rightBot.y, b_rightBot.z)
-
-        rotation = self.relativeRot + _worldRotation
-        f_leftTop = f_leftTop.getRotatedVec(rotation.x, rotation.y, rotation.z) + _worldPosition
-        f_rightTop = f_rightTop.getRotatedVec(rotation.x, rotation.y, rotation.z) + _worldPosition
-        f_leftBot = f_leftBot.getRotatedVec(rotation.x, rotation.y, rotation.z) + _worldPosition
-        f_rightBot = f_rightBot.getRotatedVec(rotation.x, rotation.y, rotation.z) + _worldPosition
-
-        b_leftTop = b_leftTop.getRotatedVec(rotation.x, rotation.y, rotation.z) + _worldPosition
-        b_rightTop = b_rightTop.getRotatedVec(rotation.x, rotation.y, rotation.z) + _worldPosition
-        b_leftBot = b_leftBot.getRotatedVec(rotation.x, rotation.y, rotation.z) + _worldPosition
-        b_rightBot = b_rightBot.getRotatedVec(rotation.x, rotation.y, rotation.z) + _worldPosition
-
+        # new Vecs every call, the cache only keeps the values as the caller may change the Vecs in place
+        entry = self.getGeometry(_worldPosition, _worldRotation, _offset)
+        if entry[2] == None:
+            entry[2] = entry[1].tolist()
+        f_leftTop, f_rightTop, f_leftBot, f_rightBot, b_leftTop, b_rightTop, b_leftBot, b_rightBot = [Vec(x, y, z) for x, y, z in entry[2]]
         return [f_leftTop, f_rightTop, f_leftBot, f_rightBot, b_leftTop, b_rightTop, b_leftBot, b_rightBot]
 
+    def getWorldBounds(self, _worldPosition=Vec(0,0,0), _worldRotation=Vec(0,0,0), _offset=Vec(0,0,0)):
+        # axis aligned bounds (min, max) around the rotated hitbox, padded slightly against rounding
+        entry = self.getGeometry(_worldPosition, _worldRotation, _offset)
+        if entry[3] == None:
+            pad = 1e-6
+            entry[3] = ((entry[1].min(axis=0) - pad).tolist(), (entry[1].max(axis=0) + pad).tolist())
+        minPos, maxPos = entry[3]
+        return Vec(minPos[0], minPos[1], minPos[2]), Vec(maxPos[0], maxPos[1], maxPos[2])
+
     def doesPositionMeet(self, _position, _worldPosition=Vec(0,0,0), _worldRotation=Vec(0,0,0), _offset=Vec(0,0,0)):
         f_leftTopOrigin = self.relativePos - self.halfExtents - _offset
         b_rightBotOrigin = self.relativePos + self.halfExtents + _offset
 
-        rotation = self.relativeRot + _worldRotation
-        positionOrigin = (_position - _worldPosition).getRotatedVec(-rotation.x, -rotation.y, -rotation.z)
+        # undo the rotation in reverse order (x, y then z) to get back into hitbox space
+        positionOrigin = GetRotation(self.relativeRot.x + _worldRotation.x, self.relativeRot.y + _worldRotation.y, self.relativeRot.z + _worldRotation.z).applyInverse(_position - _worldPosition)
 
         bX = (positionOrigin.x >= f_leftTopOrigin.x and positionOrigin.x <= b_rightBotOrigin.x)
         bY = (positionOrigin.y >= f_leftTopOrigin.y and positionOrigin.y <= b_rightBotOrigin.y)
@@ -143,41 +537,565 @@ class HitBox:
 
         
 
+# A uniform grid that buckets hitboxes by the cells their world bounds overlap, used as broadphase for scene queries
+class SpatialHash:
+    def __init__(self, _cellSize=64):
+        self.cellSize = _cellSize                   # the size of a cubic cell (pixels)
+        self.cells = {}                             # cell key -> {hitbox: (order, entity, hitbox)}
+        self.entityEntries = {}                     # entity id -> (pose key, [(hitbox, cell keys)])
+
+    def getCellRange(self, _minPos, _maxPos):
+        return (int(math.floor(_minPos.x / self.cellSize)), int(math.floor(_maxPos.x / self.cellSize)),
+                int(math.floor(_minPos.y / self.cellSize)), int(math.floor(_maxPos.y / self.cellSize)),
+                int(math.floor(_minPos.z / self.cellSize)), int(math.floor(_maxPos.z / self.cellSize)))
+
+    def getCellKeys(self, _minPos, _maxPos):
+        minX, maxX, minY, maxY, minZ, maxZ = self.getCellRange(_minPos, _maxPos)
+        keys = []
+        for x in range(minX, maxX + 1):
+            for y in range(minY, maxY + 1):
+                for z in range(minZ, maxZ + 1):
+                    keys.append((x, y, z))
+        return keys
+
+    def insertEntity(self, _entity, _order):
+        entries = []
+        for i, hBox in enumerate(_entity.hitBoxes):
+            minPos, maxPos = hBox.getWorldBounds(_entity.position, _entity.rotation)
+            keys = self.getCellKeys(minPos, maxPos)
+            for key in keys:
+                cell = self.cells.get(key)
+                if cell == None:
+                    cell = {}
+                    self.cells[key] = cell
+                cell[hBox] = ((_order, i), _entity, hBox)
+            entries.append((hBox, keys))
+        self.entityEntries[_entity.id] = (_entity.getPoseKey(), _order, entries)
+
+    def removeEntity(self, _id):
+        if _id not in self.entityEntries:
+            return False
+        for hBox, keys in self.entityEntries.pop(_id)[2]:
+            for key in keys:
+                cell = self.cells[key]
+                cell.pop(hBox, None)
+                if len(cell) == 0:
+                    del self.cells[key]
+        return True
+
+    def updateEntity(self, _entity):
+        # only reinserts the entity when it moved, rotated or its hitboxes changed since the last insert
+        poseKey, order, entries = self.entityEntries[_entity.id]
+        if poseKey == _entity.getPoseKey():
+            return False
+        self.removeEntity(_entity.id)
+        self.insertEntity(_entity, order)
+        return True
+
+    def queryBox(self, _minPos, _maxPos):
+        # returns (entity, hitbox) pairs in the cells overlapping the box, sorted in scene order
+        found = {}
+        minX, maxX, minY, maxY, minZ, maxZ = self.getCellRange(_minPos, _maxPos)
+        if (maxX - minX + 1) * (maxY - minY + 1) * (maxZ - minZ + 1) > len(self.cells):
+            # the box spans more cells than are occupied, the occupied ones are filtered by the range instead of visiting every cell
+            keys = [key for key in self.cells if minX <= key[0] <= maxX and minY <= key[1] <= maxY and minZ <= key[2] <= maxZ]
+        else:
+            keys = self.getCellKeys(_minPos, _maxPos)
+        for key in keys:
+            cell = self.cells.get(key)
+            if cell != None:
+                found.update(cell)
+        return [(entity, hBox) for order, entity, hBox in sorted(found.values(), key=lambda entry: entry[0])]
+
+    def queryPosition(self, _position):
+        cell = self.cells.get((int(math.floor(_position.x / self.cellSize)), int(math.floor(_position.y / self.cellSize)), int(math.floor(_position.z / self.cellSize))))
+        if cell == None:
+            return []
+        return [(entity, hBox) for order, entity, hBox in sorted(cell.values(), key=lambda entry: entry[0])]
+
+# A bounding volume hierarchy over the hitboxes of fixed entities, built once and refit when fixed geometry gets edited
+class StaticBVH:
+    def __init__(self, _leafSize=4):
+        self.leafSize = _leafSize                   # the maximum amount of hitboxes in a leaf
+        self.pairs = []                             # (entity, hitbox) per item, in scene order
+        self.itemBounds = []                        # (minX, minY, minZ, maxX, maxY, maxZ) per item
+        self.items = []                             # item indices ordered so every leaf holds a contiguous range
+        self.nodes = []                             # [minX, minY, minZ, maxX, maxY, maxZ, left, right, start, count], parents before children
+        self.entityKeys = {}                        # entity id -> pose key the tree was made for
+        self.needsBuild = True                      # set when fixed entities were added or removed
+        self.needsRefit = False                     # set when fixed entities moved or their hitboxes got edited
+
+    def __getstate__(self):
+        # pickled empty, the tree is rebuilt on first use
+        return StaticBVH(self.leafSize).__dict__
+
+    def updateItemBounds(self):
+        self.itemBounds = []
+        for gEntity, hBox in self.pairs:
+            minPos, maxPos = hBox.getWorldBounds(gEntity.position, gEntity.rotation)
+            self.itemBounds.append((minPos.x, minPos.y, minPos.z, maxPos.x, maxPos.y, maxPos.z))
+        for gEntity, hBox in self.pairs:
+            self.entityKeys[gEntity.id] = gEntity.getPoseKey()
+
+    def build(self, _entities):
+        self.pairs = [(gEntity, hBox) for gEntity in _entities for hBox in gEntity.hitBoxes]
+        self.entityKeys = {}
+        self.updateItemBounds()
+        for gEntity in _entities:
+            # entities without hitboxes too, so hitboxes added to them are noticed
+            self.entityKeys[gEntity.id] = gEntity.getPoseKey()
+        self.nodes = []
+        self.items = []
+        if len(self.pairs) != 0:
+            bounds = np.array(self.itemBounds)
+            centers = (bounds[:, :3] + bounds[:, 3:]) / 2
+            self.buildNode(np.arange(len(self.pairs)), bounds, centers)
+        self.needsBuild = False
+        self.needsRefit = False
+
+    def buildNode(self, _indices, _bounds, _centers):
+        # splits the items at the median of the longest axis of their centers until they fit a leaf
+        nodeIndex = len(self.nodes)
+        nodeBounds = _bounds[_indices]
+        node = nodeBounds[:, :3].min(axis=0).tolist() + nodeBounds[:, 3:].max(axis=0).tolist() + [-1, -1, 0, 0]
+        self.nodes.append(node)
+        if len(_indices) <= self.leafSize:
+            node[8] = len(self.items)
+            node[9] = len(_indices)
+            self.items += _indices.tolist()
+            return nodeIndex
+
+        centers = _centers[_indices]
+        axis = int(np.argmax(centers.max(axis=0) - centers.min(axis=0)))
+        order = _indices[np.argsort(centers[:, axis], kind='stable')]
+        half = len(order) // 2
+        node[6] = self.buildNode(order[:half], _bounds, _centers)
+        node[7] = self.buildNode(order[half:], _bounds, _centers)
+        return nodeIndex
+
+    def refit(self):
+        # recomputes the bounds bottom up without changing the tree layout
+        self.updateItemBounds()
+        for node in reversed(self.nodes):
+            if node[6] == -1:
+                itemBounds = [self.itemBounds[i] for i in self.items[node[8]:node[8] + node[9]]]
+            else:
+                itemBounds = [self.nodes[node[6]][:6], self.nodes[node[7]][:6]]
+            for axis in range(3):
+                node[axis] = min(bounds[axis] for bounds in itemBounds)
+                node[axis + 3] = max(bounds[axis + 3] for bounds in itemBounds)
+        self.needsRefit = False
+
+    def updateEntity(self, _entity):
+        # marks the tree for a refit when the entity moved or its hitboxes got edited, for a rebuild when hitboxes got added or removed
+        poseKey = self.entityKeys.get(_entity.id)
+        if poseKey == None:
+            return False
+        newPoseKey = _entity.getPoseKey()
+        if poseKey == newPoseKey:
+            return False
+        if poseKey[7] != newPoseKey[7]:
+            self.needsBuild = True
+        else:
+            self.needsRefit = True
+        self.entityKeys[_entity.id] = newPoseKey
+        return True
+
+    def queryBox(self, _minPos, _maxPos):
+        # returns the (entity, hitbox) pairs whose bounds overlap the box, in scene order
+        found = []
+        if len(self.nodes) == 0:
+            return found
+        stack = [0]
+        while len(stack) != 0:
+            node = self.nodes[stack.pop()]
+            if node[0] > _maxPos.x or node[3] < _minPos.x or node[1] > _maxPos.y or node[4] < _minPos.y or node[2] > _maxPos.z or node[5] < _minPos.z:
+                continue
+            if node[6] != -1:
+                stack.append(node[7])
+                stack.append(node[6])
+                continue
+            for i in self.items[node[8]:node[8] + node[9]]:
+                bounds = self.itemBounds[i]
+                if bounds[0] <= _maxPos.x and bounds[3] >= _minPos.x and bounds[1] <= _maxPos.y and bounds[4] >= _minPos.y and bounds[2] <= _maxPos.z and bounds[5] >= _minPos.z:
+                    found.append(i)
+        found.sort()
+        return [self.pairs[i] for i in found]
+
+# Numpy arrays holding the transforms of all hitboxes in a scene so positions can be tested against them in one go
+class HitBoxBatch:
+    def __init__(self):
+        self.pairs = []                             # (entity, hitbox) per row, in scene order
+        self.rows = {}                              # hitbox -> row
+        self.entityRows = {}                        # entity id -> (pose key, rows)
+        self.worldPositions = np.zeros((0, 3))
+        self.rotations = np.zeros((0, 3, 3))
+        self.lowerBounds = np.zeros((0, 3))          # the hitbox corners in hitbox space (relative position -/+ half extents)
+        self.upperBounds = np.zeros((0, 3))
+        self.dirty = True                           # set when entities were added or removed and the arrays need a rebuild
+
+    def __getstate__(self):
+        # pickled empty, the arrays are rebuilt on first use
+        return HitBoxBatch().__dict__
+
+    def writeRow(self, _row, _entity, _hitBox):
+        halfExtents = _hitBox.halfExtents
+        self.worldPositions[_row] = (_entity.position.x, _entity.position.y, _entity.position.z)
+        self.rotations[_row] = _hitBox.getRotationMatrix(_entity.rotation)
+        self.lowerBounds[_row] = (_hitBox.relativePos.x - halfExtents.x, _hitBox.relativePos.y - halfExtents.y, _hitBox.relativePos.z - halfExtents.z)
+        self.upperBounds[_row] = (_hitBox.relativePos.x + halfExtents.x, _hitBox.relativePos.y + halfExtents.y, _hitBox.relativePos.z + halfExtents.z)
+
+    def build(self, _entities):
+        self.pairs = [(gEntity, hBox) for gEntity in _entities for hBox in gEntity.hitBoxes]
+        count = len(self.pairs)
+        self.rows = {}
+        self.entityRows = {}
+        self.worldPositions = np.zeros((count, 3))
+        self.rotations = np.zeros((count, 3, 3))
+        self.lowerBounds = np.zeros((count, 3))
+        self.upperBounds = np.zeros((count, 3))
+        for row, (gEntity, hBox) in enumerate(self.pairs):
+            self.rows[hBox] = row
+            self.writeRow(row, gEntity, hBox)
+        for gEntity in _entities:
+            self.entityRows[gEntity.id] = (gEntity.getPoseKey(), [self.rows[hBox] for hBox in gEntity.hitBoxes])
+        self.dirty = False
+
+    def updateEntity(self, _entity):
+        # rewrites the rows of an entity when it moved, rotated or a hitbox was edited, new hitboxes require a rebuild
+        if self.dirty or _entity.id not in self.entityRows:
+            return False
+        poseKey, rows = self.entityRows[_entity.id]
+        newPoseKey = _entity.getPoseKey()
+        if poseKey == newPoseKey:
+            return False
+        if poseKey[7] != newPoseKey[7]:
+            self.dirty = True
+            return True
+        for row, hBox in zip(rows, _entity.hitBoxes):
+            self.writeRow(row, _entity, hBox)
+        self.entityRows[_entity.id] = (newPoseKey, rows)
+        return True
+
+    def getOrientedBoxes(self, _rows):
+        # world centers, rotations and half extents of the given rows
+        rotations = self.rotations[_rows]
+        centers = np.einsum('kij,kj->ki', rotations, (self.lowerBounds[_rows] + self.upperBounds[_rows]) / 2) + self.worldPositions[_rows]
+        halfExtents = (self.upperBounds[_rows] - self.lowerBounds[_rows]) / 2
+        return centers, rotations, halfExtents
+
+    def queryPositions(self, _positions, _rows=None):
+        # returns the (N, rows) hit matrix of the positions against all rows or only the given rows
+        if _rows is None:
+            return PositionsMeetHitBoxes(_positions, self.worldPositions, self.rotations, self.lowerBounds, self.upperBounds)
+        return PositionsMeetHitBoxes(_positions, self.worldPositions[_rows], self.rotations[_rows], self.lowerBounds[_rows], self.upperBounds[_rows])
+
+# Contiguous numpy arrays holding the state of all entities of a scene, so gravity, restraints and integration run as one pass
+class EntityStateStore:
+    blockedNames = ["blockedDown", "blockedUp", "blockedLeft", "blockedRight", "blockedFront", "blockedBack"]
+
+    def __init__(self, _capacity=64):
+        self.count = 0                                      # the amount of rows in use
+        self.entities = []                                  # the entity per row
+        self.position = np.zeros((_capacity, 3))
+        self.velocity = np.zeros((_capacity, 3))
+        self.rotation = np.zeros((_capacity, 3))
+        self.maxVelocity = np.zeros((_capacity, 3))
+        self.blocked = np.zeros((_capacity, 6), bool)       # columns ordered like blockedNames
+        self.dynamic = np.zeros(_capacity, bool)            # true for non fixed physics entities that are awake
+
+    def grow(self):
+        capacity = len(self.position) * 2
+        for name in ["position", "velocity", "rotation", "maxVelocity", "blocked", "dynamic"]:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+        # point the views of the entities to the new arrays
+        for gEntity in self.entities:
+            gEntity._position.array = self.position
+            gEntity._velocity.array = self.velocity
+            gEntity._rotation.array = self.rotation
+
+    def writeEntity(self, _row, _entity):
+        self.position[_row] = (_entity.position.x, _entity.position.y, _entity.position.z)
+        self.velocity[_row] = (_entity.velocity.x, _entity.velocity.y, _entity.velocity.z)
+        self.rotation[_row] = (_entity.rotation.x, _entity.rotation.y, _entity.rotation.z)
+        self.blocked[_row] = [getattr(_entity, name) for name in self.blockedNames]
+        self.updateEntityPhysics(_entity, _row)
+
+    def updateEntityPhysics(self, _entity, _row=None):
+        # call after changing the physics (fixed, maxVelocity) of an entity that is already stored
+        row = _entity.stateIndex if _row == None else _row
+        self.dynamic[row] = _entity.physics != None and not _entity.physics.fixed and not _entity.asleep
+        if _entity.physics != None:
+            self.maxVelocity[row] = (_entity.physics.maxVelocity.x, _entity.physics.maxVelocity.y, _entity.physics.maxVelocity.z)
+
+    def addEntity(self, _entity):
+        if self.count == len(self.position):
+            self.grow()
+        row = self.count
+        self.writeEntity(row, _entity)
+        self.entities.append(_entity)
+        self.count += 1
+        _entity.attachStateStore(self, row)
+
+    def addEntities(self, _entities, _states):
+        # adds many entities at once, their states are copied from _states holding the rows per array name (position, velocity, ...)
+        while self.count + len(_entities) > len(self.position):
+            self.grow()
+        start = self.count
+        for name, rows in _states.items():
+            getattr(self, name)[start:start + len(_entities)] = rows
+        for row, gEntity in enumerate(_entities, start):
+            gEntity.attachStateStore(self, row)
+        self.entities.extend(_entities)
+        self.count += len(_entities)
+
+    def removeEntity(self, _entity):
+        row = _entity.stateIndex
+        _entity.detachStateStore()
+
+        # move the last row into the free one
+        last = self.count - 1
+        lastEntity = self.entities.pop()
+        if row != last:
+            for name in ["position", "velocity", "rotation", "maxVelocity", "blocked", "dynamic"]:
+                array = getattr(self, name)
+                array[row] = array[last]
+            self.entities[row] = lastEntity
+            lastEntity.stateIndex = row
+            lastEntity._position.index = row
+            lastEntity._velocity.index = row
+            lastEntity._rotation.index = row
+        self.count -= 1
+
+    def applyGravity(self, _gravity):
+        dynamic = self.dynamic[:self.count]
+        self.velocity[:self.count][dynamic] += (_gravity.x, _gravity.y, _gravity.z)
+
+    def applyContacts(self, _entities, _contacts):
+        # same as EntityPhysics.applyContacts for the given entities at once, _contacts maps the entity id to (blocked, ground)
+        # sets the blocked flags and lets the friction of the ground decay the velocity towards zero without changing its sign
+        if len(_entities) == 0:
+            return
+        rows = np.array([gEntity.stateIndex for gEntity in _entities], np.intp)
+        self.blocked[rows] = [_contacts[gEntity.id][0] for gEntity in _entities]
+
+        grounded = [(gEntity.stateIndex, _contacts[gEntity.id][1].physics.friction) for gEntity in _entities if _contacts[gEntity.id][1] != None]
+        if len(grounded) == 0:
+            return
+        groundedRows = np.array([row for row, friction in grounded], np.intp)
+        friction = np.array([(friction.x, friction.y, friction.z) for row, friction in grounded], np.float64)
+        velocity = self.velocity[groundedRows]
+        self.velocity[groundedRows] = np.where(velocity < 0, np.minimum(velocity + friction, 0), np.where(velocity > 0, np.maximum(velocity - friction, 0), velocity))
+
+    def applyRestraints(self):
+        # same as EntityPhysics.afterUpdate for all dynamic entities, blocked directions stop the velocity and the velocity is limited
+        dynamic = self.dynamic[:self.count]
+        velocity = self.velocity[:self.count]
+        blocked = self.blocked[:self.count]
+
+        velocity[dynamic & blocked[:, 0] & (velocity[:, 1] > 0), 1] = 0
+        velocity[dynamic & blocked[:, 1] & (velocity[:, 1] < 0), 1] = 0
+        velocity[dynamic & blocked[:, 2] & (velocity[:, 0] < 0), 0] = 0
+        velocity[dynamic & blocked[:, 3] & (velocity[:, 0] > 0), 0] = 0
+        velocity[dynamic & blocked[:, 5] & (velocity[:, 2] > 0), 2] = 0
+        velocity[dynamic & blocked[:, 4] & (velocity[:, 2] < 0), 2] = 0
+
+        maxVelocity = self.maxVelocity[:self.count][dynamic]
+        velocity[dynamic] = np.clip(velocity[dynamic], -maxVelocity, maxVelocity)
+
+    def integrate(self, _timePassed):
+        dynamic = self.dynamic[:self.count]
+        self.position[:self.count][dynamic] += self.velocity[:self.count][dynamic] * _timePassed
+
+# A callback referenced by name ("module:function"), so entities and scene factories holding it can be pickled and sent to other processes
+class CallBack:
+    def __init__(self, _path, **_arguments):
+        self.path = _path                       # "module:function", the function has to be importable (module level)
+        self.arguments = _arguments             # keyword arguments added to every call
+        self.function = None                    # the imported function, resolved on the first call
+
+    def __call__(self, *_args):
+        if self.function == None:
+            moduleName, functionName = self.path.split(":")
+            self.function = importlib.import_module(moduleName)
+            for name in functionName.split("."):
+                self.function = getattr(self.function, name)
+        return self.function(*_args, **self.arguments)
+
+    def __getstate__(self):
+        return {"path": self.path, "arguments": self.arguments, "function": None}
+
 # a Entity, holding basic information about the positioning of the entity and how it interacts with the world
 class Entity:
-    def __init__(self, _name, _id, _position=Vec(0,0,0), _rotation=Vec(0,0,0), _physics=None, _updateCallBack=None):
+    def __init__(self, _name, _id, _position=Vec(0,0,0), _rotation=Vec(0,0,0), _physics=None, _updateCallBack=None, _onCollisionEnter=None, _onCollisionStay=None, _onCollisionExit=None):
         self.name = _name
         self.id = _id 
 
-        self.hitBoxes = []
-        self.position = _position
-        self.rotation = _rotation
-        self.velocity = Vec(0,0,0)             # the velocity to be applied on the position (pixels per second), only applied when a non fixed physics entity is existing
+        self.stateStore = None                 # the EntityStateStore holding position, rotation, velocity and blocked flags, None if kept in this object
+        self.stateIndex = -1                   # the row in the state store
+
+        self._hitBoxes = []
+        self.hitBoxSource = None               # (checkpoint hitbox arrays, first row, count) of hitboxes not built yet, see loadHitBoxes
+        self.hitBoxListVersion = 0             # increased when hitboxes are added or removed (addHitBox, removeHitBox)
+        self.scene = None                      # the scene the entity was added to, told when the entity is moved (poseChanged)
+        self._position = EntityVec(self, _position.x, _position.y, _position.z)    # own copies, the Vecs are changed in place
+        self._rotation = EntityVec(self, _rotation.x, _rotation.y, _rotation.z)
+        self._velocity = Vec(0,0,0)            # the velocity to be applied on the position (pixels per second), only applied when a non fixed physics entity is existing
         
         self.physics = _physics            # the entity holding information about the physics (requires a member function update(_scene, _entity) function to work)
-        self.blockedUp = False                 # applies restraints to the velocity
-        self.blockedLeft = False
-        self.blockedRight = False
-        self.blockedDown = False
-        self.blockedFront = False
-        self.blockedBack = False
+        self.blockedFlags = [False] * 6        # applies restraints to the velocity, accessed through blockedDown, blockedUp, ... (order of EntityStateStore.blockedNames)
 
         self.updateCallBack = _updateCallBack   # a function to call after apply basic physics, is also called without having a physics if set
 
+        # functions called with (scene, entity, contact) before the update callback, when a hitbox starts touching a hitbox of another
+        # entity, for every tick it keeps touching and once with the last contact after it stopped (see Scene.dispatchCollisionEvents)
+        self.onCollisionEnter = _onCollisionEnter
+        self.onCollisionStay = _onCollisionStay
+        self.onCollisionExit = _onCollisionExit
+
+        self.asleep = False                    # true while the scene skips collision checks and integration of the resting entity
+        self.restTime = 0                      # how long the entity has been resting (seconds)
+
         self.color = (255,0,0) 
+
+        self.probeCache = None                 # [hitbox key, stacked hitbox space probes, face ranges] of getCollisionPositionArrays
         
+    def getPosition(self):
+        return self._position
+
+    def setPosition(self, _vec):
+        # copies the values, so the entity never shares its Vec that is changed in place
+        self._position.assign(_vec)
+
+    def getRotation(self):
+        return self._rotation
+
+    def setRotation(self, _vec):
+        self._rotation.assign(_vec)
+
+    def getVelocity(self):
+        return self._velocity
+
+    def setVelocity(self, _vec):
+        self._velocity.assign(_vec)
+
+    def getHitBoxes(self):
+        if self.hitBoxSource != None:
+            self.loadHitBoxes()
+        return self._hitBoxes
+
+    def setHitBoxes(self, _hitBoxes):
+        self.hitBoxSource = None
+        self._hitBoxes = _hitBoxes
+        self.hitBoxListVersion += 1
+        for hBox in _hitBoxes:
+            hBox.owner = self
+        self.poseChanged()
+
+    position = property(getPosition, setPosition)
+    rotation = property(getRotation, setRotation)
+    velocity = property(getVelocity, setVelocity)
+    hitBoxes = property(getHitBoxes, setHitBoxes)
+
+    def __getstate__(self):
+        # hitboxes not built yet are built first, instead of pickling the whole checkpoint they come from
+        self.getHitBoxes()
+        return self.__dict__.copy()
+
+    def loadHitBoxes(self):
+        # builds the hitboxes of an entity restored from a checkpoint (Scene.createSnapshotEntities) on first use
+        (names, shapes, positions, rotations, versions), first, count = self.hitBoxSource
+        self.hitBoxSource = None
+        rows = slice(first, first + count)
+        for name, shape, position, rotation, version in zip(names[rows].tolist(), shapes[rows].tolist(), positions[rows].tolist(), rotations[rows].tolist(), versions[rows].tolist()):
+            hBox = HitBox(name, self.id, Vec(*shape), Vec(*position), Vec(*rotation))
+            hBox.version = version
+            hBox.owner = self
+            self._hitBoxes.append(hBox)
+
+    def getHitBoxCount(self):
+        # the amount of hitboxes, without building the ones not built yet
+        return self.hitBoxSource[2] if self.hitBoxSource != None else len(self._hitBoxes)
+
+    def attachStateStore(self, _store, _index):
+        self.stateStore = _store
+        self.stateIndex = _index
+        self._position = VecView(_store.position, _index, self)
+        self._rotation = VecView(_store.rotation, _index, self)
+        self._velocity = VecView(_store.velocity, _index)
+
+    def detachStateStore(self):
+        # copies the stored state back into this object
+        store = self.stateStore
+        row = self.stateIndex
+        self.blockedFlags = [bool(flag) for flag in store.blocked[row]]
+        self.stateStore = None
+        self.stateIndex = -1
+        self._position = EntityVec(self, *store.position[row].tolist())
+        self._rotation = EntityVec(self, *store.rotation[row].tolist())
+        self._velocity = Vec(*store.velocity[row].tolist())
+
+    def hasCollisionCallBacks(self):
+        return self.onCollisionEnter != None or self.onCollisionStay != None or self.onCollisionExit != None
+
+    def getCollisionCallBacks(self):
+        return (self.onCollisionEnter, self.onCollisionStay, self.onCollisionExit)
+
+    def setCollisionCallBacks(self, _callBacks):
+        self.onCollisionEnter, self.onCollisionStay, self.onCollisionExit = _callBacks
+
+    def poseChanged(self):
+        # called when the position or rotation got changed, the scene refreshes its indices for the entity before the next query
+        if self.scene != None:
+            self.scene.movedEntities[self.id] = self
+
+    def getPoseKey(self):
+        # changes whenever the entity moved, rotated or one of its hitboxes got edited, added or removed
+        return (self.position.x, self.position.y, self.position.z, self.rotation.x, self.rotation.y, self.rotation.z,
+                tuple([hBox.version for hBox in self.hitBoxes]), self.hitBoxListVersion)
+
+    def getWorldBounds(self, _offset=Vec(0,0,0)):
+        # axis aligned bounds (min, max) around all hitboxes
+        minPos = Vec(math.inf, math.inf, math.inf)
+        maxPos = Vec(-math.inf, -math.inf, -math.inf)
+        for hBox in self.hitBoxes:
+            hMin, hMax = hBox.getWorldBounds(self.position, self.rotation, _offset)
+            minPos = Vec(min(minPos.x, hMin.x), min(minPos.y, hMin.y), min(minPos.z, hMin.z))
+            maxPos = Vec(max(maxPos.x, hMax.x), max(maxPos.y, hMax.y), max(maxPos.z, hMax.z))
+        return minPos, maxPos
+
     def createHitBox(self, _shape, _relativePos=Vec(0,0,0), _relativeRot=Vec(0,0,0), _name="HitBox"):
         name = _name
         if _name == "HitBox":
             name = self.name + "_" + _name + "_" + str(len(self.hitBoxes))
         else:
             name = self.name + "_" + "HitBox" + "_" + _name
-        self.hitBoxes.append(HitBox(name, self.id, _shape, _relativePos, _relativeRot))
+        self.addHitBox(HitBox(name, self.id, _shape, _relativePos, _relativeRot))
+
+    def addHitBox(self, _hitBox):
+        _hitBox.owner = self
+        self.hitBoxes.append(_hitBox)
+        self.hitBoxListVersion += 1
+        self.poseChanged()
+
+    def removeHitBox(self, _hitBox):
+        self.hitBoxes.remove(_hitBox)
+        _hitBox.owner = None
+        self.hitBoxListVersion += 1
+        self.poseChanged()
             
-    def update(self, _scene):
-        # pre update
+    def update(self, _scene, _contacts=None):
+        profiler = _scene.profiler
+        if profiler != None:
+            return self.updateProfiled(_scene, _contacts, profiler)
+
+        # pre update, _contacts are the result of physics.detectContacts when already detected by the scene
         if self.physics != None:
-            self.physics.preUpdate(_scene, self)
+            self.physics.preUpdate(_scene, self, _contacts)
 
         # callback user update
         if self.updateCallBack != None:
@@ -188,291 +1106,1693 @@ class Entity:
             self.physics.afterUpdate(_scene, self)
         return
 
+    def updateProfiled(self, _scene, _contacts, _profiler):
+        # update adding the time of each part to the profiler, the contacts are detected up front so "physics" leaves out "detect"
+        # (the scene tick already did that for entities in a state store)
+        if self.physics != None and not self.physics.fixed and _contacts == None and self.stateStore == None:
+            _contacts = self.physics.detectContacts(_scene, self)
+        start = time.perf_counter()
+        if self.physics != None:
+            self.physics.preUpdate(_scene, self, _contacts)
+            start = _profiler.stop("physics", start)
+        if self.updateCallBack != None:
+            self.updateCallBack(_scene, self)
+            start = _profiler.stop("callbacks", start)
+        if self.physics != None:
+            self.physics.afterUpdate(_scene, self)
+            _profiler.stop("restraints", start)
+
+    def getCollisionPositionArrays(self, _points=5, _pixelOffset=Vec(3,3,3)):
+        # the contact probes of all hitboxes in world space as one (N,3) array per face (bottom, top, left, right, front, back),
+        # transforms the cached hitbox space probes with one batched matrix multiply
+        if len(self.hitBoxes) == 0:
+            return [np.zeros((0, 3)) for i in range(6)]
+
+        key = (_points, _pixelOffset.x, _pixelOffset.y, _pixelOffset.z, tuple([(id(hBox), hBox.version) for hBox in self.hitBoxes]))
+        if self.probeCache == None or self.probeCache[0] != key:
+            templates = [hBox.getProbeTemplate(_points, _pixelOffset) for hBox in self.hitBoxes]
+            faceCounts = templates[0][1]
+            faceStarts = np.cumsum([0] + faceCounts).tolist()
+            self.probeCache = [key, np.stack([probes for probes, counts in templates]), list(zip(faceStarts[:-1], faceStarts[1:]))]
+        key, probes, faceRanges = self.probeCache
+
+        rotations = np.stack([hBox.getRotationMatrix(self.rotation) for hBox in self.hitBoxes])
+        world = np.matmul(probes, rotations.transpose(0, 2, 1)) + (self.position.x, self.position.y, self.position.z)
+        return [world[:, start:end].reshape(-1, 3) for start, end in faceRanges]
+
     def getCollisionPositions(self, _points=5, _pixelOffset=Vec(3,3,3)):
         # Interpolates outer edges of all hitboxes and returns them as lists
-        bottomPositions = []
-        topPositions = []
-        leftPositions = []
-        rightPositions = []
-        frontPositions = []
-        backPositions = []
-        for hBox in self.hitBoxes:
-            f_leftTop, f_rightTop, f_leftBot, f_rightBot, b_leftTop, b_rightTop, b_leftBot, b_rightBot = hBox.getBoundingRect(self.position, self.rotation, _pixelOffset)
-            
-            # bottom collision points
-            bottomPositions += InterpolatePositionsBetweenPoints(f_leftBot, f_rightBot)
-            bottomPositions += InterpolatePositionsBetweenPoints(f_leftBot, f_leftBot)
-            bottomPositions += InterpolatePositionsBetweenPoints(f_rightBot, b_rightBot)
-            bottomPositions += InterpolatePositionsBetweenPoints(b_rightBot, b_leftBot)
-
-            # top collision points
-            topPositions += InterpolatePositionsBetweenPoints(f_leftTop, f_rightTop)
-            topPositions += InterpolatePositionsBetweenPoints(f_leftTop, f_leftTop)
-            topPositions += InterpolatePositionsBetweenPoints(f_rightTop, b_rightTop)
-            topPositions += InterpolatePositionsBetweenPoints(b_rightTop, b_leftTop)
-
-            # left
-            leftPositions += InterpolatePositionsBetweenPoints(f_leftTop, f_leftBot)
-            leftPositions += InterpolatePositionsBetweenPoints(b_leftTop, b_leftBot)
-
-            # right positions
-            rightPositions += InterpolatePositionsBetweenPoints(f_rightTop, f_rightBot)        
-            rightPositions += InterpolatePositionsBetweenPoints(b_leftTop, b_leftBot)
-
-            # front positions
-            frontPositions += InterpolatePositionsBetweenPoints(f_leftTop, f_leftBot)
-            frontPositions += InterpolatePositionsBetweenPoints(f_rightTop, f_rightBot)
-
-            # back positions
-            backPositions += InterpolatePositionsBetweenPoints(b_leftTop, b_leftBot)
-            backPositions += InterpolatePositionsBetweenPoints(b_rightTop, b_rightBot)
+        return [[Vec(x, y, z) for x, y, z in positions.tolist()] for positions in self.getCollisionPositionArrays(_points, _pixelOffset)]
+
+def BlockedFlagProperty(_index):
+    # property reading a blocked flag from the state store if the entity has one
+    def getFlag(self):
+        if self.stateStore != None:
+            return bool(self.stateStore.blocked[self.stateIndex, _index])
+        return self.blockedFlags[_index]
+
+    def setFlag(self, _value):
+        if self.stateStore != None:
+            self.stateStore.blocked[self.stateIndex, _index] = _value
+        else:
+            self.blockedFlags[_index] = _value
+    return property(getFlag, setFlag)
 
-        return [bottomPositions,topPositions,leftPositions,rightPositions,frontPositions,backPositions]
+for i, name in enumerate(EntityStateStore.blockedNames):
+    setattr(Entity, name, BlockedFlagProperty(i))
 
 # A class that can be use to enable hitbox detection for entities and holds properties with the regards to interactions done by or to ther entities
 class EntityPhysics:
     def __init__(self, _fixed=True, _maxVelocity=Vec(1000, 1000, 1000), _friction=Vec(0,0,0)):    
         self.fixed = _fixed                     # false if the entity is supposed to move
-        self.friction = _friction               # the amount of friction to apply to other moving entities
-        self.maxVelocity = _maxVelocity         # the maximum velocity (pixels per second) of an entity 
+        self.friction = _friction.copy()        # the amount of friction to apply to other moving entities, own copies as Vecs may be changed in place
+        self.maxVelocity = _maxVelocity.copy()  # the maximum velocity (pixels per second) of an entity 
               
     def getFirstMeetingPhysicsEntity(self, _scene, _entity, _positions, _entityMeetingIsFixed=True):
         # returns the first entity a given entity collides with
-        entitiesMeetingIds = _scene.getEntiesMeetingPositions(_positions)
+        entitiesMeetingIds = _scene.getEntiesMeetingPositions(_positions, _entityMeetingIsFixed)
+        checkedIds = set()
         for i in entitiesMeetingIds:
-            if i == _entity.id:
+            if i == _entity.id or i in checkedIds:
                 continue
+            checkedIds.add(i)
             meetingEntity = _scene.getEntity(i)
             if meetingEntity.physics != None and (meetingEntity.physics.fixed and _entityMeetingIsFixed) or (not meetingEntity.physics.fixed and not _entityMeetingIsFixed):
                 return (True, meetingEntity)
         return (False, None)
 
-    def preUpdate(self, _scene, _entity):
-        # skip if fixed entity 
-        if self.fixed:
-            return
-
-        # apply gravity
-        _entity.velocity += _scene.gravity
+    def detectContacts(self, _scene, _entity):
+        # returns which directions are blocked (order of EntityStateStore.blockedNames) and the fixed entity below, only reads the scene
+        profiler = _scene.profiler
+        if profiler == None:
+            return self.findContacts(_scene, _entity)
+        start = time.perf_counter()
+        contacts = self.findContacts(_scene, _entity)
+        profiler.stop("detect", start)
+        return contacts
+
+    def findContacts(self, _scene, _entity):
+        if _scene.collisionMode == "sat":
+            blocked = [False] * 6
+            ground = None
+            for contact in _scene.getCachedEntityContacts(_entity, True):
+                blocked[contact.direction] = True
+                if contact.direction == 0 and ground == None:
+                    ground = contact.otherEntity
+            return blocked, ground
 
         # get collision points to check on
-        bottomPositions,topPositions,leftPositions,rightPositions,frontPositions,backPositions = _entity.getCollisionPositions()
+        bottomPositions,topPositions,leftPositions,rightPositions,frontPositions,backPositions = _entity.getCollisionPositionArrays()
+        if _scene.profiler != None:
+            _scene.profiler.count("probePoints", len(bottomPositions) + len(topPositions) + len(leftPositions) + len(rightPositions) + len(frontPositions) + len(backPositions))
 
-        # check if touching ground or not and apply corresponding physics
+        # check touching ground, right, top, left, front and back
         downFound, ground = self.getFirstMeetingPhysicsEntity(_scene, _entity, bottomPositions, True)
-        if downFound:
-            _entity.blockedDown = True
-
-            if _entity.velocity.x < 0:
-                _entity.velocity.x += ground.physics.friction.x
-                if _entity.velocity.x > 0:
-                    _entity.velocity.x = 0
-                    
-            elif _entity.velocity.x > 0:
-                _entity.velocity.x -= ground.physics.friction.x
-                if _entity.velocity.x < 0:
-                    _entity.velocity.x = 0
-
-            if _entity.velocity.y < 0:
-                _entity.velocity.y += ground.physics.friction.y
-                if _entity.velocity.y > 0:
-                    _entity.velocity.y = 0
-                    
-            elif _entity.velocity.y > 0:
-                _entity.velocity.y -= ground.physics.friction.y
-                if _entity.velocity.y < 0:
-                    _entity.velocity.y = 0
-
-            if _entity.velocity.z < 0:
-                _entity.velocity.z += ground.physics.friction.z
-                if _entity.velocity.z > 0:
-                    _entity.velocity.z = 0
-                    
-            elif _entity.velocity.z > 0:
-                _entity.velocity.z -= ground.physics.friction.z
-                if _entity.velocity.z < 0:
-                    _entity.velocity.z = 0      
-
-        if _entity.blockedDown and not downFound:
-            _entity.blockedDown = False
-
-        # check if touching right
         rightFound = self.getFirstMeetingPhysicsEntity(_scene, _entity, rightPositions, True)[0]
-        if rightFound:
-            _entity.blockedRight = True
-
-        if _entity.blockedRight and not rightFound:
-            _entity.blockedRight = False
-
-        # check if touching top
         topFound = self.getFirstMeetingPhysicsEntity(_scene, _entity, topPositions, True)[0]
-        if topFound:
-            _entity.blockedUp = True
-
-        if _entity.blockedUp and not topFound:
-            _entity.blockedUp = False
-
-        # check if touching left
         leftFound = self.getFirstMeetingPhysicsEntity(_scene, _entity, leftPositions, True)[0]
-        if leftFound:
-            _entity.blockedLeft = True
-
-        if _entity.blockedLeft and not leftFound:
-            _entity.blockedLeft = False
-
-        # check if touching front
         frontFound = self.getFirstMeetingPhysicsEntity(_scene, _entity, frontPositions, True)[0]
-        if frontFound:
-            _entity.blockedFront = True
+        backFound = self.getFirstMeetingPhysicsEntity(_scene, _entity, backPositions, True)[0]
+        return [downFound, topFound, leftFound, rightFound, frontFound, backFound], ground
+
+    def applyContacts(self, _entity, _blocked, _ground):
+        # sets the blocked flags and applies the friction of the ground
+        if _ground != None:
+            velocity = _entity.velocity
+            friction = _ground.physics.friction
+            if velocity.x < 0:
+                velocity.x += friction.x
+                if velocity.x > 0:
+                    velocity.x = 0
+                    
+            elif velocity.x > 0:
+                velocity.x -= friction.x
+                if velocity.x < 0:
+                    velocity.x = 0
+
+            if velocity.y < 0:
+                velocity.y += friction.y
+                if velocity.y > 0:
+                    velocity.y = 0
+                    
+            elif velocity.y > 0:
+                velocity.y -= friction.y
+                if velocity.y < 0:
+                    velocity.y = 0
+
+            if velocity.z < 0:
+                velocity.z += friction.z
+                if velocity.z > 0:
+                    velocity.z = 0
+                    
+            elif velocity.z > 0:
+                velocity.z -= friction.z
+                if velocity.z < 0:
+                    velocity.z = 0      
 
-        if _entity.blockedFront and not frontFound:
-            _entity.blockedFront = False
+        _entity.blockedDown, _entity.blockedUp, _entity.blockedLeft, _entity.blockedRight, _entity.blockedFront, _entity.blockedBack = _blocked
 
-        # check if touching back
-        backFound = self.getFirstMeetingPhysicsEntity(_scene, _entity, backPositions, True)[0]
-        if backFound:
-            _entity.blockedBack = True
+    def preUpdate(self, _scene, _entity, _contacts=None):
+        # skip if fixed entity 
+        if self.fixed:
+            return
 
-        if _entity.blockedBack and not backFound:
-            _entity.blockedBack = False
+        # gravity and the contacts are applied for all entities at once when they are kept in a state store, contacts passed by the
+        # scene tick are already applied by then
+        if _entity.stateStore != None:
+            if _contacts == None:
+                _entity.stateStore.applyContacts([_entity], {_entity.id: self.detectContacts(_scene, _entity)})
+            return
+        _entity.velocity += _scene.gravity
 
+        # check what the entity touches and apply corresponding physics
+        blocked, ground = self.detectContacts(_scene, _entity) if _contacts == None else _contacts
+        self.applyContacts(_entity, blocked, ground)
 
     def afterUpdate(self, _scene, _entity):
-        # skip if fixed entity 
-        if self.fixed:
+        # skip if fixed entity or if the state store applies the restraints for all entities at once
+        if self.fixed or _entity.stateStore != None:
             return
 
+        velocity = _entity.velocity
+        maxVelocity = self.maxVelocity
+
         # apply restraints <TODO> apply the restraints based on the direction of the entity is facing
-        if _entity.blockedDown and _entity.velocity.y > 0:
-            _entity.velocity.y = 0
+        if _entity.blockedDown and velocity.y > 0:
+            velocity.y = 0
 
-        if _entity.blockedUp and _entity.velocity.y < 0:
-            _entity.velocity.y = 0
+        if _entity.blockedUp and velocity.y < 0:
+            velocity.y = 0
 
-        if _entity.blockedLeft and _entity.velocity.x < 0:
-            _entity.velocity.x = 0
+        if _entity.blockedLeft and velocity.x < 0:
+            velocity.x = 0
 
-        if _entity.blockedRight and _entity.velocity.x > 0:
-            _entity.velocity.x = 0
+        if _entity.blockedRight and velocity.x > 0:
+            velocity.x = 0
 
-        if _entity.blockedBack and _entity.velocity.z > 0:
-            _entity.velocity.z = 0
+        if _entity.blockedBack and velocity.z > 0:
+            velocity.z = 0
 
-        if _entity.blockedFront and _entity.velocity.z < 0:
-            _entity.velocity.z = 0
+        if _entity.blockedFront and velocity.z < 0:
+            velocity.z = 0
 
         # limit velocity <TODO, apply based on direction and norm>
-        if _entity.velocity.y > self.maxVelocity.y:
-            _entity.velocity.y = self.maxVelocity.y
-        if _entity.velocity.y < 0 - self.maxVelocity.y:
-            _entity.velocity.y = 0 - self.maxVelocity.y
+        if velocity.y > maxVelocity.y:
+            velocity.y = maxVelocity.y
+        if velocity.y < 0 - maxVelocity.y:
+            velocity.y = 0 - maxVelocity.y
 
-        if _entity.velocity.x > self.maxVelocity.x:
-            _entity.velocity.x = self.maxVelocity.x
-        if _entity.velocity.x < 0 - self.maxVelocity.x:
-            _entity.velocity.x = 0 - self.maxVelocity.x
+        if velocity.x > maxVelocity.x:
+            velocity.x = maxVelocity.x
+        if velocity.x < 0 - maxVelocity.x:
+            velocity.x = 0 - maxVelocity.x
 
-        if _entity.velocity.z > self.maxVelocity.z:
-            _entity.velocity.z = self.maxVelocity.z
-        if _entity.velocity.z < 0 - self.maxVelocity.z:
-            _entity.velocity.z = 0 - self.maxVelocity.z 
+        if velocity.z > maxVelocity.z:
+            velocity.z = maxVelocity.z
+        if velocity.z < 0 - maxVelocity.z:
+            velocity.z = 0 - maxVelocity.z 
 
         return
 
+# Collects the time spent per phase, counters of the hot paths and the update cost per entity. Attached to scenes and renderers
+# with setProfiler, nothing is measured while they have none. Totals are kept per frame (ended by endFrame, called by Engine.run)
+# and the last _window frames are kept for rolling statistics
+class Profiler:
+    def __init__(self, _window=120):
+        self.window = _window
+        self.frameTimes = {}                    # phase -> seconds spent in the current frame
+        self.frameCounters = {}                 # counter -> amount counted in the current frame
+        self.frameEntityCosts = {}              # entity id -> seconds spent updating the entity in the current frame
+        self.history = deque(maxlen=_window)    # (times, counters, entity costs) of the last finished frames
+        self.frameCount = 0                     # the amount of frames ended
+        self.lock = threading.Lock()            # counting may happen on the narrowphase threads
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["lock"] = None
+        return state
+
+    def __setstate__(self, _state):
+        self.__dict__.update(_state)
+        self.lock = threading.Lock()
+
+    def stop(self, _phase, _start):
+        # adds the time since _start (a time.perf_counter value) to a phase, returns the current time to start the next phase with
+        now = time.perf_counter()
+        with self.lock:
+            self.frameTimes[_phase] = self.frameTimes.get(_phase, 0) + now - _start
+        return now
+
+    def count(self, _counter, _amount=1):
+        with self.lock:
+            self.frameCounters[_counter] = self.frameCounters.get(_counter, 0) + _amount
+
+    def addEntityCost(self, _id, _seconds):
+        with self.lock:
+            self.frameEntityCosts[_id] = self.frameEntityCosts.get(_id, 0) + _seconds
+
+    def endFrame(self):
+        with self.lock:
+            self.history.append((self.frameTimes, self.frameCounters, self.frameEntityCosts))
+            self.frameTimes = {}
+            self.frameCounters = {}
+            self.frameEntityCosts = {}
+            self.frameCount += 1
+
+    def reset(self):
+        with self.lock:
+            self.history.clear()
+            self.frameTimes = {}
+            self.frameCounters = {}
+            self.frameEntityCosts = {}
+
+    def getFrames(self):
+        # the finished frames of the window, or only the current frame when no frame was ended yet
+        with self.lock:
+            if len(self.history) == 0:
+                return [(dict(self.frameTimes), dict(self.frameCounters), dict(self.frameEntityCosts))]
+            return list(self.history)
+
+    def getStats(self):
+        # per phase (seconds) and per counter the last, mean and max value per frame over the window
+        frames = self.getFrames()
+        stats = {"frames": len(frames), "phases": {}, "counters": {}}
+        for group, index in (("phases", 0), ("counters", 1)):
+            names = set()
+            for frame in frames:
+                names.update(frame[index].keys())
+            for name in sorted(names):
+                values = [frame[index].get(name, 0) for frame in frames]
+                stats[group][name] = {"last": values[-1], "mean": sum(values) / len(values), "max": max(values)}
+        return stats
+
+    def getEntityCosts(self, _top=10):
+        # the entities taking the most time, as (id, mean seconds per frame) from expensive to cheap
+        frames = self.getFrames()
+        totals = {}
+        for frame in frames:
+            for i, seconds in frame[2].items():
+                totals[i] = totals.get(i, 0) + seconds
+        costs = sorted(((i, seconds / len(frames)) for i, seconds in totals.items()), key=lambda cost: cost[1], reverse=True)
+        return costs[:_top]
+
+    def getOverlayLines(self):
+        # short text lines of the mean values, drawn by a renderer showing the profiler
+        stats = self.getStats()
+        lines = ["%s %.2fms" % (name, value["mean"] * 1000) for name, value in stats["phases"].items()]
+        lines += ["%s %.0f" % (name, value["mean"]) for name, value in stats["counters"].items()]
+        return lines
+
 # The
 class Scene:
-    def __init__(self, _id, _gravity=Vec(0, 1, 0), _ticksPerSecond=1000):
+    def __init__(self, _id, _gravity=Vec(0, 1, 0), _ticksPerSecond=1000, _useSpatialHash=False, _spatialHashCellSize=64, _useBatchQueries=True, _useStateStore=False, _useFixedTimeStep=False, _useStaticBVH=False,
+                 _useSleeping=False, _sleepVelocity=1, _sleepTime=0.5, _collisionMode="probe", _contactMargin=3,
+                 _useContinuousCollision=False, _skinWidth=1, _narrowphaseWorkers=1, _narrowphaseProcesses=False):
         self.id = _id                               # a unique id of the scene
 
-        self.entities = []                       # a list of enties to draw in the scene
+        self.entityMap = {}                         # id -> entity of all entities in the scene, in the order they were added
+        self.entityList = None                      # cached list of the entities, rebuilt after adding or removing
+        self.staticEntities = {}                    # id -> entity with fixed physics and no callback, their update does nothing
+        self.dynamicEntities = {}                   # id -> entity of all other entities, the ones visited by tick
+        self.movedEntities = {}                     # id -> entity moved outside of the scene update, refreshed before the next query (refreshMovedEntities)
 
-        self.gravity = _gravity                     # the gravity applied to physics entities
+        self.gravity = _gravity.copy()              # the gravity applied to physics entities, an own copy as Vecs may be changed in place
         
         self.lastTickTime = time.time()             # saves the time the last tick (loop) was done
         self.lastUpdateTime = time.time()           # save the time the last update was done
 
         self.ticksPerSecond = _ticksPerSecond       # amount of ticks to update in a update phase
 
-    def getHitBoxesMeetingPosition(self, _position): # <TO FIX, doesnt work with rotated rectangles>
+        self.useFixedTimeStep = _useFixedTimeStep   # if true update advances in steps of 1/ticksPerSecond instead of integrating the measured time
+        self.timeAccumulator = 0                    # simulated time still to be stepped in fixed timestep mode
+        self.simulationTime = 0                     # the total time simulated by step
+        self.tickCount = 0                          # the amount of ticks done
+
+        self.spatialHash = None                     # optional broadphase index, when None every query scans all hitboxes (reference mode)
+        if _useSpatialHash:
+            self.spatialHash = SpatialHash(_spatialHashCellSize)
+        self.entityOrder = 0                        # increasing counter keeping the broadphase results in scene order
+
+        self.hitBoxBatch = None                     # numpy transforms of all hitboxes, when None positions are tested one by one (reference mode)
+        if _useBatchQueries:
+            self.hitBoxBatch = HitBoxBatch()
+
+        self.stateStore = None                      # optional array storage of the entity states, integrating all entities in one pass
+        if _useStateStore:
+            self.stateStore = EntityStateStore()
+
+        self.staticBVH = None                       # optional tree over the fixed entities answering the collision queries for fixed geometry
+        if _useStaticBVH:
+            self.staticBVH = StaticBVH()
+
+        self.useSleeping = _useSleeping             # if true entities resting on the ground are put to sleep and skipped until woken
+        self.sleepVelocity = _sleepVelocity         # the speed (pixels per second) below which an entity counts as resting
+        self.sleepTime = _sleepTime                 # how long (seconds) an entity has to rest before it falls asleep
+        self.sleepingEntities = {}                  # id -> entity that is asleep
+
+        self.collisionMode = _collisionMode         # "probe" tests points sampled on the hitbox edges, "sat" tests the boxes against each other (separating axes)
+        self.contactMargin = _contactMargin         # the distance (pixels) at which boxes count as touching in "sat" mode and for collision events
+        self.contactCache = {}                      # (entity id, fixed only) -> (pose key, pose keys of the other entities, contacts) of getCachedEntityContacts
+        self.collisionPairs = {}                    # entity id -> {(hitbox, other hitbox): contact} of the last dispatchCollisionEvents
+
+        self.useContinuousCollision = _useContinuousCollision   # if true moves longer than the contact margin are swept against fixed hitboxes and stopped at the first contact
+        self.skinWidth = _skinWidth                 # the distance (pixels) kept to the surface an entity got stopped at
+
+        self.narrowphaseWorkers = _narrowphaseWorkers   # if more than 1 the contacts of all entities are detected first, split over this many workers
+        self.narrowphaseProcesses = _narrowphaseProcesses   # if true the workers are processes (state store scenes only), threads share the GIL
+                                                            # and only the numpy parts of the detection run in parallel on them
+        self.narrowphaseExecutor = None             # the thread pool, created on first use
+        self.narrowphasePool = None                 # the NarrowphaseProcessPool, created on first use
+        self.layoutVersion = 0                      # increased when entities are added, removed or rolled back, or fixed entities changed
+        self.fixedPoseKeys = {}                     # id -> pose key of the fixed entities at their last refresh, kept with narrowphase processes only
+
+        self.profiler = None                        # optional Profiler measuring the phases of the update, nothing is measured when None
+        self.recorder = None                        # optional TrajectoryRecorder storing the state of the entities after every tick
+
+    def __getstate__(self):
+        # thread and process pools can not be pickled, new ones are made on first use, the profiler and recorder stay with the original scene
+        state = self.__dict__.copy()
+        state["narrowphaseExecutor"] = None
+        state["narrowphasePool"] = None
+        state["profiler"] = None
+        state["recorder"] = None
+        return state
+
+    def setRecorder(self, _recorder):
+        # starts recording the entities currently in the scene, None stops recording (the recorder still has to be closed)
+        self.recorder = _recorder
+        if _recorder != None:
+            _recorder.start(self)
+
+    def setProfiler(self, _profiler):
+        self.profiler = _profiler
+
+    def getProfilingStats(self):
+        # the rolling statistics of the profiler, None when not profiling
+        if self.profiler == None:
+            return None
+        return self.profiler.getStats()
+
+    def getEntities(self):
+        # the entities in the order they were added
+        if self.entityList == None:
+            self.entityList = list(self.entityMap.values())
+        return self.entityList
+
+    entities = property(getEntities)
+
+    def isFixedEntity(self, _entity):
+        return _entity.physics != None and _entity.physics.fixed
+
+    def isStaticEntity(self, _entity):
+        return _entity.physics != None and _entity.physics.fixed and _entity.updateCallBack == None and not _entity.hasCollisionCallBacks()
+
+    def getHitBoxBatch(self):
+        # without batch queries enabled a temporary batch is built for every call
+        self.refreshMovedEntities()
+        if self.hitBoxBatch == None:
+            batch = HitBoxBatch()
+            batch.build(self.entities)
+            return batch
+        if self.hitBoxBatch.dirty:
+            self.hitBoxBatch.build(self.entities)
+        return self.hitBoxBatch
+
+    def getStaticBVH(self):
+        self.refreshMovedEntities()
+        if self.staticBVH.needsBuild:
+            self.staticBVH.build([gEntity for gEntity in self.entities if self.isFixedEntity(gEntity)])
+        elif self.staticBVH.needsRefit:
+            self.staticBVH.refit()
+        return self.staticBVH
+
+    def getCandidateHitBoxes(self, _minPos, _maxPos, _fixedOnly=False):
+        # the (entity, hitbox) pairs that may overlap the box in scene order, None when there is no index and all hitboxes have to be tested
+        # with _fixedOnly the result may be limited to the hitboxes of fixed entities
+        self.refreshMovedEntities()
+        if _fixedOnly and self.staticBVH != None:
+            return self.getStaticBVH().queryBox(_minPos, _maxPos)
+        if self.spatialHash != None:
+            return self.spatialHash.queryBox(_minPos, _maxPos)
+        return None
+
+    def getHitBoxesMeetingPositions(self, _positions, _fixedOnly=False):
+        # batch version of getHitBoxesMeetingPosition, returns the hit matrix (positions x hitboxes) and the tested hitboxes
+        batch = self.getHitBoxBatch()
+        positions = VecsToArray(_positions)
+        if len(positions) == 0:
+            return np.zeros((0, 0), bool), []
+
+        minPos = positions.min(axis=0)
+        maxPos = positions.max(axis=0)
+        candidates = self.getCandidateHitBoxes(Vec(minPos[0], minPos[1], minPos[2]), Vec(maxPos[0], maxPos[1], maxPos[2]), _fixedOnly)
+        if candidates == None:
+            hits, hitBoxes = batch.queryPositions(positions), [hBox for gEntity, hBox in batch.pairs]
+        else:
+            hits, hitBoxes = batch.queryPositions(positions, [batch.rows[hBox] for gEntity, hBox in candidates]), [hBox for gEntity, hBox in candidates]
+        if self.profiler != None:
+            self.profiler.count("pointTests", hits.size)
+        return hits, hitBoxes
+
+    def getHitBoxesMeetingPosition(self, _position):
         hitBoxes = []
+        if self.spatialHash != None:
+            self.refreshMovedEntities()
+            candidates = self.spatialHash.queryPosition(_position)
+            if self.profiler != None:
+                self.profiler.count("pointTests", len(candidates))
+            for gEntity, hBox in candidates:
+                if hBox.doesPositionMeet(_position, gEntity.position, gEntity.rotation):
+                    hitBoxes.append(hBox)
+            return hitBoxes
+
+        pointTests = 0
         for gEntity in self.entities:
+            pointTests += len(gEntity.hitBoxes)
             for hBox in gEntity.hitBoxes:
                     if hBox.doesPositionMeet(_position, gEntity.position, gEntity.rotation):
                         hitBoxes.append(hBox)
                     continue
+        if self.profiler != None:
+            self.profiler.count("pointTests", pointTests)
         return hitBoxes
 
-    def getEntiesMeetingPositions(self, _positions):
+    def getEntiesMeetingPositions(self, _positions, _fixedOnly=False):
+        # returns the owner id per hitbox met, for each position in turn, _fixedOnly allows skipping non fixed entities
         entityIds = []
+        if self.hitBoxBatch != None:
+            hits, hitBoxes = self.getHitBoxesMeetingPositions(_positions, _fixedOnly)
+            for positionIndex, hitBoxIndex in zip(*np.nonzero(hits)):
+                entityIds.append(hitBoxes[hitBoxIndex].ownerId)
+            if self.profiler != None:
+                self.profiler.count("hitBoxesHit", len(entityIds))
+            return entityIds
+
+        if isinstance(_positions, np.ndarray):
+            _positions = [Vec(x, y, z) for x, y, z in _positions.tolist()]
+        if _fixedOnly and self.staticBVH != None and len(_positions) != 0:
+            minPos = Vec(min(p.x for p in _positions), min(p.y for p in _positions), min(p.z for p in _positions))
+            maxPos = Vec(max(p.x for p in _positions), max(p.y for p in _positions), max(p.z for p in _positions))
+            candidates = self.getStaticBVH().queryBox(minPos, maxPos)
+            for position in _positions:
+                for gEntity, hBox in candidates:
+                    if hBox.doesPositionMeet(position, gEntity.position, gEntity.rotation):
+                        entityIds.append(hBox.ownerId)
+            if self.profiler != None:
+                self.profiler.count("pointTests", len(_positions) * len(candidates))
+                self.profiler.count("hitBoxesHit", len(entityIds))
+            return entityIds
+
         for position in _positions:
             hitBoxesMeeting = self.getHitBoxesMeetingPosition(position)
             for hBox in hitBoxesMeeting:
                 entityIds.append(hBox.ownerId)
+        if self.profiler != None:
+            self.profiler.count("hitBoxesHit", len(entityIds))
         return entityIds
 
+    def getContactCandidates(self, _entity, _fixedOnly=False):
+        # the (entity, hitbox) pairs of other entities within the contact margin of the bounds of an entity, in scene order
+        margin = self.contactMargin
+        minPos, maxPos = _entity.getWorldBounds(Vec(margin, margin, margin))
+        candidates = self.getCandidateHitBoxes(minPos, maxPos, _fixedOnly)
+        if candidates == None:
+            candidates = self.getHitBoxBatch().pairs
+        return [(gEntity, hBox) for gEntity, hBox in candidates if gEntity.id != _entity.id and (not _fixedOnly or self.isFixedEntity(gEntity))]
+
+    def getEntityContacts(self, _entity, _fixedOnly=False):
+        # tests the hitboxes of an entity against the hitboxes of other entities with separating axes,
+        # returns the contacts within the contact margin in scene order of the other hitboxes
+        return self.testEntityContacts(_entity, self.getContactCandidates(_entity, _fixedOnly))
+
+    def testEntityContacts(self, _entity, _candidates):
+        margin = self.contactMargin
+        if len(_candidates) == 0 or len(_entity.hitBoxes) == 0:
+            return []
+        batch = self.getHitBoxBatch()
+        centers, rotations, halfExtents = batch.getOrientedBoxes([batch.rows[hBox] for gEntity, hBox in _candidates])
+
+        position = np.array((_entity.position.x, _entity.position.y, _entity.position.z))
+        separations = []
+        normals = []
+        for hBox in _entity.hitBoxes:
+            rotation = hBox.getRotationMatrix(_entity.rotation)
+            center = rotation @ (hBox.relativePos.x, hBox.relativePos.y, hBox.relativePos.z) + position
+            boxSeparations, boxNormals = OrientedBoxSeparations(center, rotation, np.array((hBox.halfExtents.x, hBox.halfExtents.y, hBox.halfExtents.z)), centers, rotations, halfExtents)
+            separations.append(boxSeparations)
+            normals.append(boxNormals)
+
+        contacts = []
+        for k, h in zip(*np.nonzero(np.array(separations).T <= margin)):
+            normal = normals[h][k]
+            otherEntity, otherHitBox = _candidates[k]
+            contacts.append(Contact(_entity, _entity.hitBoxes[h], otherEntity, otherHitBox, Vec(normal[0], normal[1], normal[2]), -float(separations[h][k])))
+        if self.profiler != None:
+            self.profiler.count("boxTests", len(_entity.hitBoxes) * len(_candidates))
+            self.profiler.count("hitBoxesHit", len(contacts))
+        return contacts
+
+    def getCachedEntityContacts(self, _entity, _fixedOnly=False):
+        # getEntityContacts keeping the result in the contact cache, when the entity did not move since the last call only the
+        # hitboxes of other entities that moved (or got edited) since then are tested again
+        candidates = self.getContactCandidates(_entity, _fixedOnly)
+        poseKeys = {}
+        for gEntity, hBox in candidates:
+            if gEntity.id not in poseKeys:
+                poseKeys[gEntity.id] = gEntity.getPoseKey()
+        poseKey = _entity.getPoseKey()
+
+        cacheKey = (_entity.id, _fixedOnly)
+        entry = self.contactCache.get(cacheKey)
+        if entry == None or entry[0] != poseKey:
+            contacts = self.testEntityContacts(_entity, candidates)
+        else:
+            cachedPoseKeys, cachedContacts = entry[1], entry[2]
+            unchanged = set([i for i, key in poseKeys.items() if cachedPoseKeys.get(i) == key])
+            candidateOrder = {hBox: k for k, (gEntity, hBox) in enumerate(candidates)}
+            contacts = [contact for contact in cachedContacts if contact.otherEntity.id in unchanged and contact.otherHitBox in candidateOrder]
+            changed = [(gEntity, hBox) for gEntity, hBox in candidates if gEntity.id not in unchanged]
+            if len(changed) != 0:
+                contacts += self.testEntityContacts(_entity, changed)
+                # back into the order of getEntityContacts
+                hitBoxOrder = {hBox: h for h, hBox in enumerate(_entity.hitBoxes)}
+                contacts.sort(key=lambda contact: (candidateOrder[contact.otherHitBox], hitBoxOrder[contact.hitBox]))
+        self.contactCache[cacheKey] = (poseKey, poseKeys, contacts)
+        return contacts
+
+    def dispatchCollisionEvents(self, _entity):
+        # compares the contacts of an entity (with all other entities, tested with separating axes in any collision mode) with the ones
+        # of the last dispatch, calls onCollisionEnter for new (hitbox, other hitbox) pairs, onCollisionStay for the ones kept and
+        # onCollisionExit with the last contact of the pairs that ended
+        contacts = {(contact.hitBox, contact.otherHitBox): contact for contact in self.getCachedEntityContacts(_entity)}
+        lastContacts = self.collisionPairs.get(_entity.id, {})
+        self.collisionPairs[_entity.id] = contacts
+        for pair, contact in contacts.items():
+            if pair in lastContacts:
+                if _entity.onCollisionStay != None:
+                    _entity.onCollisionStay(self, _entity, contact)
+            elif _entity.onCollisionEnter != None:
+                _entity.onCollisionEnter(self, _entity, contact)
+        if _entity.onCollisionExit != None:
+            for pair, contact in lastContacts.items():
+                if pair not in contacts:
+                    _entity.onCollisionExit(self, _entity, contact)
+
+    def getCollisionContacts(self, _entity):
+        # the contacts of the last dispatchCollisionEvents of an entity, empty for entities without collision callbacks
+        return list(self.collisionPairs.get(_entity.id, {}).values())
+
+    def sweepEntity(self, _entity, _displacement):
+        # returns the displacement clamped at the first fixed hitbox hit on the way, and the velocity without the part into that hitbox
+        minPos, maxPos = _entity.getWorldBounds()
+        sweptMin = Vec(min(minPos.x, minPos.x + _displacement.x), min(minPos.y, minPos.y + _displacement.y), min(minPos.z, minPos.z + _displacement.z))
+        sweptMax = Vec(max(maxPos.x, maxPos.x + _displacement.x), max(maxPos.y, maxPos.y + _displacement.y), max(maxPos.z, maxPos.z + _displacement.z))
+        batch = self.getHitBoxBatch()
+        candidates = self.getCandidateHitBoxes(sweptMin, sweptMax, True)
+        if candidates == None:
+            candidates = batch.pairs
+        candidates = [(gEntity, hBox) for gEntity, hBox in candidates if gEntity.id != _entity.id and self.isFixedEntity(gEntity)]
+        if len(candidates) == 0:
+            return _displacement, _entity.velocity
+
+        centers, rotations, halfExtents = batch.getOrientedBoxes([batch.rows[hBox] for gEntity, hBox in candidates])
+        center = np.array(((minPos.x + maxPos.x) / 2, (minPos.y + maxPos.y) / 2, (minPos.z + maxPos.z) / 2))
+        extents = np.array(((maxPos.x - minPos.x) / 2, (maxPos.y - minPos.y) / 2, (maxPos.z - minPos.z) / 2))
+        times, normals = SweptBoxTimesOfImpact(center, extents, np.array((_displacement.x, _displacement.y, _displacement.z)), centers, rotations, halfExtents)
+        first = int(np.argmin(times))
+        if not np.isfinite(times[first]):
+            return _displacement, _entity.velocity
+
+        # stop the skin width before the surface, the velocity is restrained like for the blocked direction of a discrete contact: only
+        # its component along the axis moving the entity most into the surface is stopped (the dominant axis of the normal for axis
+        # aligned surfaces, the fall for a body landing on a slope), keeping the rest would turn a fall onto a slope into sliding
+        normal = Vec(*normals[first].tolist())
+        displacement = _displacement * float(times[first]) + normal * self.skinWidth
+        velocity = _entity.velocity
+        components = [velocity.x, velocity.y, velocity.z]
+        axis = int(np.argmin(np.array(components) * normals[first]))
+        if components[axis] * normals[first][axis] < 0:
+            components[axis] = 0
+            velocity = Vec(*components)
+        return displacement, velocity
+
+    def getQueryCandidates(self, _minPos, _maxPos, _fixedOnly=False, _ignoreIds=()):
+        # the candidate (entity, hitbox) pairs of a region query in scene order and their rows in the hitbox batch
+        batch = self.getHitBoxBatch()
+        candidates = None
+        if np.all(np.isfinite((_minPos.x, _minPos.y, _minPos.z, _maxPos.x, _maxPos.y, _maxPos.z))):
+            candidates = self.getCandidateHitBoxes(_minPos, _maxPos, _fixedOnly)
+        if candidates == None:
+            candidates = batch.pairs
+        ignoreIds = set(_ignoreIds)
+        candidates = [(gEntity, hBox) for gEntity, hBox in candidates if gEntity.id not in ignoreIds and (not _fixedOnly or self.isFixedEntity(gEntity))]
+        return candidates, np.array([batch.rows[hBox] for gEntity, hBox in candidates], np.intp)
+
+    def raycast(self, _origins, _directions, _maxDistance=np.inf, _fixedOnly=False, _ignoreIds=()):
+        # casts rays (lists of Vec or (N,3) arrays, the directions are normalized) against the hitboxes, returns per ray the owner id of
+        # the first hitbox hit (None on a miss) as object array, the distance to it (inf on a miss) and the world normal of the face hit.
+        # _maxDistance is one distance or one per ray, _ignoreIds are entity ids to cast through (like the entity casting)
+        origins = VecsToArray(_origins)
+        directions = VecsToArray(_directions)
+        lengths = np.linalg.norm(directions, axis=1)
+        directions = directions / np.where(lengths == 0, 1, lengths)[:, None]
+        maxDistances = np.broadcast_to(np.asarray(_maxDistance, np.float64), (len(origins),))
+        entityIds = np.full(len(origins), None, object)
+        if len(origins) == 0:
+            return entityIds, np.zeros(0), np.zeros((0, 3))
+
+        with np.errstate(invalid='ignore'):
+            ends = origins + directions * maxDistances[:, None]
+            minPos = np.minimum(origins, ends).min(axis=0)
+            maxPos = np.maximum(origins, ends).max(axis=0)
+        candidates, rows = self.getQueryCandidates(Vec(*minPos.tolist()), Vec(*maxPos.tolist()), _fixedOnly, _ignoreIds)
+        centers, rotations, halfExtents = self.getHitBoxBatch().getOrientedBoxes(rows)
+        distances, indices, normals = RaysHitBoxes(origins, directions, maxDistances, centers, rotations, halfExtents)
+        for i, index in enumerate(indices.tolist()):
+            if index != -1:
+                entityIds[i] = candidates[index][0].id
+        if self.profiler != None:
+            self.profiler.count("rayTests", len(origins) * len(candidates))
+        return entityIds, distances, normals
+
+    def getOverlaps(self, _hits, _candidates):
+        # turns an overlap matrix (queries x candidates) into the query index, owner id and hitbox per overlap
+        queryIndices, candidateIndices = np.nonzero(_hits)
+        hitBoxes = [_candidates[k][1] for k in candidateIndices.tolist()]
+        entityIds = np.array([_candidates[k][0].id for k in candidateIndices.tolist()] + [None], object)[:-1]
+        if self.profiler != None:
+            self.profiler.count("overlapTests", _hits.size)
+        return queryIndices, entityIds, hitBoxes
+
+    def overlapBox(self, _centers, _halfExtents, _rotations=None, _fixedOnly=False, _ignoreIds=()):
+        # finds the hitboxes overlapping boxes given by their centers, half extents (one Vec for all or one per box) and optional
+        # rotations (Vec of angles like entity rotations), returns the query index, owner id (object array) and hitbox per overlap,
+        # ordered by query and then scene order
+        centers = VecsToArray(_centers)
+        halfExtents = np.broadcast_to(VecsToArray([_halfExtents] if isinstance(_halfExtents, Vec) else _halfExtents), centers.shape)
+        rotations = [None] * len(centers) if _rotations == None else ([_rotations] * len(centers) if isinstance(_rotations, Vec) else _rotations)
+        matrices = [np.eye(3) if rotation == None else GetRotationMatrix(rotation.x, rotation.y, rotation.z) for rotation in rotations]
+        if len(centers) == 0:
+            return np.zeros(0, np.intp), np.zeros(0, object), []
+
+        # the query bounds around the rotated boxes
+        radii = np.array([np.abs(matrix) @ extents for matrix, extents in zip(matrices, halfExtents)])
+        minPos = (centers - radii).min(axis=0)
+        maxPos = (centers + radii).max(axis=0)
+        candidates, rows = self.getQueryCandidates(Vec(*minPos.tolist()), Vec(*maxPos.tolist()), _fixedOnly, _ignoreIds)
+        hits = np.zeros((len(centers), len(candidates)), bool)
+        if len(candidates) != 0:
+            boxCenters, boxRotations, boxHalfExtents = self.getHitBoxBatch().getOrientedBoxes(rows)
+            for i in range(len(centers)):
+                separations, normals = OrientedBoxSeparations(centers[i], matrices[i], halfExtents[i], boxCenters, boxRotations, boxHalfExtents)
+                hits[i] = separations <= 0
+        return self.getOverlaps(hits, candidates)
+
+    def overlapSphere(self, _centers, _radii, _fixedOnly=False, _ignoreIds=()):
+        # finds the hitboxes overlapping spheres, _radii is one radius or one per sphere, returns like overlapBox
+        centers = VecsToArray(_centers)
+        radii = np.broadcast_to(np.asarray(_radii, np.float64), (len(centers),))
+        if len(centers) == 0:
+            return np.zeros(0, np.intp), np.zeros(0, object), []
+        minPos = (centers - radii[:, None]).min(axis=0)
+        maxPos = (centers + radii[:, None]).max(axis=0)
+        candidates, rows = self.getQueryCandidates(Vec(*minPos.tolist()), Vec(*maxPos.tolist()), _fixedOnly, _ignoreIds)
+        boxCenters, boxRotations, boxHalfExtents = self.getHitBoxBatch().getOrientedBoxes(rows)
+        return self.getOverlaps(SpheresMeetHitBoxes(centers, radii, boxCenters, boxRotations, boxHalfExtents), candidates)
+
+    def getHitBoxesMeetingBox(self, _minPos, _maxPos):
+        # returns the hitboxes whose world bounds overlap the axis aligned box between _minPos and _maxPos
+        if self.spatialHash != None:
+            self.refreshMovedEntities()
+            candidates = self.spatialHash.queryBox(_minPos, _maxPos)
+        else:
+            candidates = [(gEntity, hBox) for gEntity in self.entities for hBox in gEntity.hitBoxes]
+
+        hitBoxes = []
+        for gEntity, hBox in candidates:
+            minPos, maxPos = hBox.getWorldBounds(gEntity.position, gEntity.rotation)
+            if minPos.x <= _maxPos.x and maxPos.x >= _minPos.x and minPos.y <= _maxPos.y and maxPos.y >= _minPos.y and minPos.z <= _maxPos.z and maxPos.z >= _minPos.z:
+                hitBoxes.append(hBox)
+        return hitBoxes
+
+    def refreshEntity(self, _entity):
+        # call after changing the hitboxes of an entity outside of the scene update, moving it is picked up by refreshMovedEntities
+        self.movedEntities.pop(_entity.id, None)
+        if self.spatialHash != None and _entity.id in self.spatialHash.entityEntries:
+            self.spatialHash.updateEntity(_entity)
+        if self.hitBoxBatch != None:
+            self.hitBoxBatch.updateEntity(_entity)
+        if self.staticBVH != None and self.isFixedEntity(_entity):
+            self.staticBVH.updateEntity(_entity)
+        if self.narrowphaseProcesses and self.isFixedEntity(_entity):
+            # the copies of the narrowphase processes have to be reloaded
+            poseKey = _entity.getPoseKey()
+            if self.fixedPoseKeys.get(_entity.id) != poseKey:
+                self.fixedPoseKeys[_entity.id] = poseKey
+                self.layoutVersion += 1
+
+    def refreshMovedEntities(self):
+        # refreshes the indices of the entities whose position or rotation got changed since their last refresh (Entity.poseChanged),
+        # called before the indices are used
+        if len(self.movedEntities) == 0:
+            return
+        moved = list(self.movedEntities.values())
+        for gEntity in moved:
+            self.refreshEntity(gEntity)
+        if any([self.isFixedEntity(gEntity) for gEntity in moved]):
+            # sleeping entities may have rested on it
+            self.wakeAll()
+
+    def refreshEntityPhysics(self, _entity):
+        # call after changing the physics or callback of an entity that is already in the scene
+        self.staticEntities.pop(_entity.id, None)
+        self.dynamicEntities.pop(_entity.id, None)
+        if self.isStaticEntity(_entity):
+            self.staticEntities[_entity.id] = _entity
+        else:
+            # keep the tick order the same as the scene order
+            self.dynamicEntities = {gEntity.id: gEntity for gEntity in self.entities if not self.isStaticEntity(gEntity)}
+        if self.stateStore != None:
+            self.stateStore.updateEntityPhysics(_entity)
+        if self.staticBVH != None:
+            self.staticBVH.needsBuild = True
+        self.layoutVersion += 1
+
     def addEntity(self, _entity):
-        for gEntity in self.entities:
-            if _entity.id == gEntity.id:
-                print("could not add entity with id %i because already existing" % gEntity.id)
-                return False
+        if _entity.id in self.entityMap:
+            print("could not add entity with id %s because already existing" % _entity.id)
+            return False
 
-        self.entities.append(_entity)
+        self.entityMap[_entity.id] = _entity
+        self.entityList = None
+        _entity.scene = self
+        if self.isStaticEntity(_entity):
+            self.staticEntities[_entity.id] = _entity
+        else:
+            self.dynamicEntities[_entity.id] = _entity
+        if self.stateStore != None and _entity.stateStore is not self.stateStore:
+            self.stateStore.addEntity(_entity)
+        if self.hitBoxBatch != None:
+            self.hitBoxBatch.dirty = True
+        if self.staticBVH != None and self.isFixedEntity(_entity):
+            self.staticBVH.needsBuild = True
+        if self.spatialHash != None:
+            self.spatialHash.insertEntity(_entity, self.entityOrder)
+        self.entityOrder += 1
+        self.layoutVersion += 1
         return True
 
     def removeEntity(self, _id):
-        for i, gEntity in enumerate(self.entities):
-            if _id == gEntity.id:
-                self.entities.pop(i)
-                return True
-        
-        print("could not find entity to remove with id %i" % gEntity.id)
-        return False
+        gEntity = self.entityMap.pop(_id, None)
+        if gEntity == None:
+            print("could not find entity to remove with id %s" % _id)
+            return False
+
+        self.entityList = None
+        gEntity.scene = None
+        self.movedEntities.pop(_id, None)
+        self.staticEntities.pop(_id, None)
+        self.dynamicEntities.pop(_id, None)
+        self.sleepingEntities.pop(_id, None)
+        self.contactCache.pop((_id, False), None)
+        self.contactCache.pop((_id, True), None)
+        self.collisionPairs.pop(_id, None)
+        self.fixedPoseKeys.pop(_id, None)
+        self.layoutVersion += 1
+        if self.stateStore != None:
+            self.stateStore.removeEntity(gEntity)
+        if self.hitBoxBatch != None:
+            self.hitBoxBatch.dirty = True
+        if self.staticBVH != None and self.isFixedEntity(gEntity):
+            self.staticBVH.needsBuild = True
+        if self.isFixedEntity(gEntity):
+            # sleeping entities may have rested on it
+            self.wakeAll()
+        if self.spatialHash != None:
+            self.spatialHash.removeEntity(_id)
+        return True
 
     def getEntity(self, _id):
+        return self.entityMap.get(_id)
+
+    def clearEntities(self):
+        # removes all entities at once, emptying the indices instead of updating them entity by entity
         for gEntity in self.entities:
-            if _id == gEntity.id:
-                return gEntity
-        return None
+            if gEntity.stateStore != None:
+                gEntity.detachStateStore()
+            gEntity.scene = None
+        self.entityMap = {}
+        self.movedEntities = {}
+        self.entityList = None
+        self.staticEntities = {}
+        self.dynamicEntities = {}
+        self.sleepingEntities = {}
+        self.contactCache = {}
+        self.collisionPairs = {}
+        self.fixedPoseKeys = {}
+        self.layoutVersion += 1
+        if self.spatialHash != None:
+            self.spatialHash = SpatialHash(self.spatialHash.cellSize)
+        if self.hitBoxBatch != None:
+            self.hitBoxBatch = HitBoxBatch()
+        if self.stateStore != None:
+            self.stateStore = EntityStateStore()
+        if self.staticBVH != None:
+            self.staticBVH = StaticBVH(self.staticBVH.leafSize)
+
+    def getConfig(self):
+        # the constructor arguments (besides the id) of a scene with the same settings
+        return {"_gravity": Vec(self.gravity.x, self.gravity.y, self.gravity.z), "_ticksPerSecond": self.ticksPerSecond,
+                "_useSpatialHash": self.spatialHash != None, "_spatialHashCellSize": self.spatialHash.cellSize if self.spatialHash != None else 64,
+                "_useBatchQueries": self.hitBoxBatch != None, "_useStateStore": self.stateStore != None, "_useFixedTimeStep": self.useFixedTimeStep,
+                "_useStaticBVH": self.staticBVH != None, "_useSleeping": self.useSleeping, "_sleepVelocity": self.sleepVelocity, "_sleepTime": self.sleepTime,
+                "_collisionMode": self.collisionMode, "_contactMargin": self.contactMargin, "_useContinuousCollision": self.useContinuousCollision,
+                "_skinWidth": self.skinWidth, "_narrowphaseWorkers": self.narrowphaseWorkers,
+                "_narrowphaseProcesses": self.narrowphaseProcesses}
+
+    def getPhysicsRows(self, _entities):
+        # the distinct physics objects of the entities and the index into them per entity (-1 without physics), shared physics stay shared
+        physicsRows = {}
+        physicsList = []
+        entityPhysics = np.full(len(_entities), -1, np.int32)
+        for i, gEntity in enumerate(_entities):
+            if gEntity.physics == None:
+                continue
+            row = physicsRows.get(id(gEntity.physics))
+            if row == None:
+                row = len(physicsList)
+                physicsRows[id(gEntity.physics)] = row
+                physicsList.append(gEntity.physics)
+            entityPhysics[i] = row
+        return physicsList, entityPhysics
+
+    def checkpoint(self):
+        # copies the state of all entities, hitboxes, physics and the timing into arrays, restored by rollback or saved by saveSnapshot.
+        # what arrays can not hold (ids, callbacks, colors) is kept in "objects"
+        entities = self.entities
+        hitBoxes = [hBox for gEntity in entities for hBox in gEntity.hitBoxes]
+        physicsList, entityPhysics = self.getPhysicsRows(entities)
+
+        if self.stateStore != None:
+            rows = [gEntity.stateIndex for gEntity in entities]
+            positions = self.stateStore.position[rows]
+            rotations = self.stateStore.rotation[rows]
+            velocities = self.stateStore.velocity[rows]
+            blocked = self.stateStore.blocked[rows]
+        else:
+            positions = VecsToArray([gEntity.position for gEntity in entities])
+            rotations = VecsToArray([gEntity.rotation for gEntity in entities])
+            velocities = VecsToArray([gEntity.velocity for gEntity in entities])
+            blocked = np.array([gEntity.blockedFlags for gEntity in entities], bool).reshape(-1, 6)
+
+        return {
+            "gravity": np.array((self.gravity.x, self.gravity.y, self.gravity.z), np.float64),
+            "timing": np.array((self.simulationTime, self.timeAccumulator, self.tickCount), np.float64),
+            "entityName": np.array([gEntity.name for gEntity in entities], str),
+            "entityPosition": positions,
+            "entityRotation": rotations,
+            "entityVelocity": velocities,
+            "entityBlocked": blocked,
+            "entityAsleep": np.array([gEntity.asleep for gEntity in entities], bool),
+            "entityRestTime": np.array([gEntity.restTime for gEntity in entities], np.float64),
+            "entityPhysics": entityPhysics,
+            "entityHitBoxCount": np.array([len(gEntity.hitBoxes) for gEntity in entities], np.int32),
+            "physicsFixed": np.array([physics.fixed for physics in physicsList], bool),
+            "physicsMaxVelocity": VecsToArray([physics.maxVelocity for physics in physicsList]),
+            "physicsFriction": VecsToArray([physics.friction for physics in physicsList]),
+            "hitBoxName": np.array([hBox.name for hBox in hitBoxes], str),
+            "hitBoxShape": VecsToArray([hBox.shape for hBox in hitBoxes]),
+            "hitBoxPosition": VecsToArray([hBox.relativePos for hBox in hitBoxes]),
+            "hitBoxRotation": VecsToArray([hBox.relativeRot for hBox in hitBoxes]),
+            "hitBoxVersion": np.array([hBox.version for hBox in hitBoxes], np.int64),
+            "objects": {"sceneId": self.id, "entityIds": [gEntity.id for gEntity in entities],
+                        "callBacks": [gEntity.updateCallBack for gEntity in entities], "colors": [gEntity.color for gEntity in entities],
+                        "collisionCallBacks": [gEntity.getCollisionCallBacks() for gEntity in entities]},
+        }
+
+    def rollback(self, _checkpoint):
+        # restores a checkpoint, when the scene still holds the same entities with the same hitboxes and physics their state is
+        # written back in place, otherwise all entities are rebuilt from the checkpoint
+        # the garbage collector is paused while creating the many objects, its passes over the growing heap would take most of the time
+        gcEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.restoreCheckpoint(_checkpoint)
+        finally:
+            if gcEnabled:
+                gc.enable()
+
+    def restoreCheckpoint(self, _checkpoint):
+        entities = self.entities
+        objects = _checkpoint["objects"]
+        physicsList, entityPhysics = self.getPhysicsRows(entities)
+        sameEntities = ([gEntity.id for gEntity in entities] == objects["entityIds"] and np.array_equal(entityPhysics, _checkpoint["entityPhysics"])
+                        and np.array_equal([gEntity.getHitBoxCount() for gEntity in entities], _checkpoint["entityHitBoxCount"]))
+        if sameEntities:
+            self.restoreEntityStates(_checkpoint, physicsList)
+        else:
+            self.clearEntities()
+            entities = self.createSnapshotEntities(_checkpoint)
+            if self.stateStore != None:
+                self.storeSnapshotEntities(entities, _checkpoint)
+            for gEntity in entities:
+                self.addEntity(gEntity)
+                if gEntity.asleep:
+                    self.sleepingEntities[gEntity.id] = gEntity
+
+        self.layoutVersion += 1
+        self.gravity = Vec(*_checkpoint["gravity"].tolist())
+        self.simulationTime, self.timeAccumulator, tickCount = _checkpoint["timing"].tolist()
+        self.tickCount = int(tickCount)
+        self.lastTickTime = time.time()
+        self.lastUpdateTime = time.time()
+
+    def restoreEntityStates(self, _checkpoint, _physicsList):
+        # writes a checkpoint back into the entities of the scene it was taken from
+        entities = self.entities
+        objects = _checkpoint["objects"]
+        for physics, fixed, maxVelocity, friction in zip(_physicsList, _checkpoint["physicsFixed"].tolist(), _checkpoint["physicsMaxVelocity"].tolist(), _checkpoint["physicsFriction"].tolist()):
+            physics.fixed = fixed
+            physics.maxVelocity = Vec(*maxVelocity)
+            physics.friction = Vec(*friction)
+
+        if self.stateStore != None:
+            rows = [gEntity.stateIndex for gEntity in entities]
+            self.stateStore.position[rows] = _checkpoint["entityPosition"]
+            self.stateStore.rotation[rows] = _checkpoint["entityRotation"]
+            self.stateStore.velocity[rows] = _checkpoint["entityVelocity"]
+            self.stateStore.blocked[rows] = _checkpoint["entityBlocked"]
+        else:
+            for gEntity, position, rotation, velocity, blocked in zip(entities, _checkpoint["entityPosition"].tolist(), _checkpoint["entityRotation"].tolist(),
+                                                                      _checkpoint["entityVelocity"].tolist(), _checkpoint["entityBlocked"].tolist()):
+                gEntity.position = Vec(*position)
+                gEntity.rotation = Vec(*rotation)
+                gEntity.velocity = Vec(*velocity)
+                gEntity.blockedFlags = blocked
+
+        # only hitboxes edited since the checkpoint are restored
+        hitBoxes = [hBox for gEntity in entities for hBox in gEntity.hitBoxes]
+        versions = np.array([hBox.version for hBox in hitBoxes], np.int64)
+        for j in np.nonzero(versions != _checkpoint["hitBoxVersion"])[0].tolist():
+            hitBoxes[j].editHitBox(Vec(*_checkpoint["hitBoxPosition"][j].tolist()), Vec(*_checkpoint["hitBoxRotation"][j].tolist()), Vec(*_checkpoint["hitBoxShape"][j].tolist()))
+
+        # collision events start over from the restored state, like after clearEntities
+        self.contactCache = {}
+        self.collisionPairs = {}
+
+        self.sleepingEntities = {}
+        for gEntity, asleep, restTime, callBack, collisionCallBacks, color in zip(entities, _checkpoint["entityAsleep"].tolist(), _checkpoint["entityRestTime"].tolist(),
+                                                                                objects["callBacks"], GetCollisionCallBacks(objects), objects["colors"]):
+            gEntity.asleep = asleep
+            gEntity.restTime = restTime
+            gEntity.updateCallBack = callBack
+            gEntity.setCollisionCallBacks(collisionCallBacks)
+            gEntity.color = color
+            if asleep:
+                self.sleepingEntities[gEntity.id] = gEntity
+
+        # the physics or callbacks may have changed which entities are static
+        self.staticEntities = {gEntity.id: gEntity for gEntity in entities if self.isStaticEntity(gEntity)}
+        self.dynamicEntities = {gEntity.id: gEntity for gEntity in entities if not self.isStaticEntity(gEntity)}
+        if self.staticBVH != None:
+            self.staticBVH.needsBuild = True
+        for gEntity in entities:
+            if self.stateStore != None:
+                self.stateStore.updateEntityPhysics(gEntity)
+            self.refreshEntity(gEntity)
+
+    def storeSnapshotEntities(self, _entities, _checkpoint):
+        # writes the states of the entities made by createSnapshotEntities straight from the checkpoint arrays into the state store,
+        # addEntity then finds them stored. Entities without physics use the extra last row (fixed, no velocity limit)
+        physicsRows = _checkpoint["entityPhysics"]
+        fixed = np.append(_checkpoint["physicsFixed"], True)[physicsRows]
+        maxVelocity = np.concatenate([_checkpoint["physicsMaxVelocity"].reshape(-1, 3), np.zeros((1, 3))])[physicsRows]
+        self.stateStore.addEntities(_entities, {"position": _checkpoint["entityPosition"], "rotation": _checkpoint["entityRotation"],
+                                                "velocity": _checkpoint["entityVelocity"], "blocked": _checkpoint["entityBlocked"],
+                                                "maxVelocity": maxVelocity, "dynamic": ~fixed & ~_checkpoint["entityAsleep"]})
+
+    def createSnapshotEntities(self, _checkpoint):
+        # builds new entities (with their physics) from a checkpoint, their hitboxes are built on first use (Entity.loadHitBoxes)
+        objects = _checkpoint["objects"]
+        physicsList = [EntityPhysics(fixed, Vec(*maxVelocity), Vec(*friction)) for fixed, maxVelocity, friction
+                       in zip(_checkpoint["physicsFixed"].tolist(), _checkpoint["physicsMaxVelocity"].tolist(), _checkpoint["physicsFriction"].tolist())]
+        hitBoxArrays = (_checkpoint["hitBoxName"], _checkpoint["hitBoxShape"], _checkpoint["hitBoxPosition"], _checkpoint["hitBoxRotation"], _checkpoint["hitBoxVersion"])
+
+        collisionCallBacks = GetCollisionCallBacks(objects)
+        entities = []
+        h = 0
+        for i, (name, position, rotation, velocity, blocked, asleep, restTime, physicsRow, hitBoxCount) in enumerate(zip(
+                _checkpoint["entityName"].tolist(), _checkpoint["entityPosition"].tolist(), _checkpoint["entityRotation"].tolist(),
+                _checkpoint["entityVelocity"].tolist(), _checkpoint["entityBlocked"].tolist(), _checkpoint["entityAsleep"].tolist(),
+                _checkpoint["entityRestTime"].tolist(), _checkpoint["entityPhysics"].tolist(), _checkpoint["entityHitBoxCount"].tolist())):
+            gEntity = Entity(name, objects["entityIds"][i], Vec(*position), Vec(*rotation), physicsList[physicsRow] if physicsRow != -1 else None, objects["callBacks"][i])
+            gEntity.velocity = Vec(*velocity)
+            gEntity.blockedFlags = blocked
+            gEntity.asleep = asleep
+            gEntity.restTime = restTime
+            gEntity.color = objects["colors"][i]
+            gEntity.setCollisionCallBacks(collisionCallBacks[i])
+            if hitBoxCount != 0:
+                gEntity.hitBoxSource = (hitBoxArrays, h, hitBoxCount)
+            h += hitBoxCount
+            entities.append(gEntity)
+        return entities
+
+    def saveSnapshot(self, _path, _compressed=False):
+        # writes a checkpoint and the settings of the scene as .npz file, read by LoadSceneSnapshot. Ids, callbacks and colors are pickled,
+        # callbacks that can not be pickled (like lambdas, use a CallBack instead) are left out
+        arrays = self.checkpoint()
+        objects = arrays.pop("objects")
+        objects["callBacks"] = [GetPicklableCallBack(callBack) for callBack in objects["callBacks"]]
+        objects["collisionCallBacks"] = [tuple([GetPicklableCallBack(callBack) for callBack in callBacks]) for callBacks in objects["collisionCallBacks"]]
+        arrays["objects"] = np.frombuffer(pickle.dumps(objects), np.uint8)
+
+        config = self.getConfig()
+        del config["_gravity"]
+        arrays["config"] = np.array(json.dumps(config))
+        if _compressed:
+            np.savez_compressed(_path, **arrays)
+        else:
+            np.savez(_path, **arrays)
+
+    def isResting(self, _entity):
+        velocity = _entity.velocity
+        return _entity.blockedDown and math.sqrt(velocity.x * velocity.x + velocity.y * velocity.y + velocity.z * velocity.z) < self.sleepVelocity
+
+    def putToSleep(self, _entity):
+        _entity.asleep = True
+        _entity.velocity = Vec(0,0,0)
+        self.sleepingEntities[_entity.id] = _entity
+        if self.stateStore != None:
+            self.stateStore.updateEntityPhysics(_entity)
+
+    def wakeEntity(self, _entity):
+        _entity.asleep = False
+        _entity.restTime = 0
+        self.sleepingEntities.pop(_entity.id, None)
+        if self.stateStore != None:
+            self.stateStore.updateEntityPhysics(_entity)
+
+    def wakeAll(self):
+        for gEntity in list(self.sleepingEntities.values()):
+            self.wakeEntity(gEntity)
+
+    def updateSleeping(self, _timePassed):
+        # counts how long entities rest, puts them to sleep and wakes sleeping entities touched by moving ones
+        self.refreshMovedEntities()
+        movers = []
+        for gEntity in self.dynamicEntities.values():
+            if gEntity.asleep or gEntity.physics == None or gEntity.physics.fixed:
+                continue
+            if self.isResting(gEntity):
+                gEntity.restTime += _timePassed
+                if gEntity.restTime >= self.sleepTime:
+                    self.putToSleep(gEntity)
+            else:
+                gEntity.restTime = 0
+                movers.append(gEntity)
+
+        if len(self.sleepingEntities) == 0:
+            return
+        for mover in movers:
+            minPos, maxPos = mover.getWorldBounds(Vec(3,3,3))
+            if self.spatialHash != None:
+                touched = [gEntity for gEntity, hBox in self.spatialHash.queryBox(minPos, maxPos) if gEntity.asleep]
+            else:
+                touched = list(self.sleepingEntities.values())
+            for gEntity in touched:
+                if not gEntity.asleep:
+                    continue
+                sMin, sMax = gEntity.getWorldBounds()
+                if sMin.x <= maxPos.x and sMax.x >= minPos.x and sMin.y <= maxPos.y and sMax.y >= minPos.y and sMin.z <= maxPos.z and sMax.z >= minPos.z:
+                    self.wakeEntity(gEntity)
+
+    def detectContactsOfEntities(self, _entities):
+        return [(gEntity.id, gEntity.physics.detectContacts(self, gEntity)) for gEntity in _entities]
+
+    def getNarrowphaseLayoutKey(self):
+        # changes with everything the narrowphase processes copied besides the poses of the dynamic entities, the hitboxes of those are
+        # compared directly as they are edited without notifying the scene
+        return (self.layoutVersion, tuple([(id(hBox), hBox.version) for gEntity in self.dynamicEntities.values() if not self.isFixedEntity(gEntity)
+                                           for hBox in gEntity.hitBoxes]))
+
+    def closeNarrowphase(self):
+        # stops the narrowphase workers, new ones are made on next use
+        if self.narrowphaseExecutor != None:
+            self.narrowphaseExecutor.shutdown()
+            self.narrowphaseExecutor = None
+        if self.narrowphasePool != None:
+            self.narrowphasePool.close()
+            self.narrowphasePool = None
+
+    def detectAllContacts(self, _entities):
+        # first phase of the two phase tick, detection only reads the scene so the entities are split over the workers
+        detecting = [gEntity for gEntity in _entities if gEntity.physics != None and not gEntity.physics.fixed and not gEntity.asleep]
+        if self.narrowphaseWorkers <= 1 or len(detecting) == 0:
+            return dict(self.detectContactsOfEntities(detecting))
+
+        if self.narrowphaseProcesses and self.stateStore != None:
+            start = time.perf_counter()
+            if self.narrowphasePool == None:
+                self.narrowphasePool = NarrowphaseProcessPool(self.narrowphaseWorkers)
+            contacts = self.narrowphasePool.detect(self, detecting)
+            if self.profiler != None:
+                # the workers have no profiler, the whole detection is counted
+                self.profiler.stop("detect", start)
+            return contacts
+
+        # build the lazy indices before the workers read them
+        if self.hitBoxBatch != None:
+            self.getHitBoxBatch()
+        if self.staticBVH != None:
+            self.getStaticBVH()
+
+        if self.narrowphaseExecutor == None:
+            self.narrowphaseExecutor = concurrent.futures.ThreadPoolExecutor(self.narrowphaseWorkers)
+        chunkSize = max(1, int(math.ceil(len(detecting) / self.narrowphaseWorkers)))
+        chunks = [detecting[i:i + chunkSize] for i in range(0, len(detecting), chunkSize)]
+        contacts = {}
+        for chunkContacts in self.narrowphaseExecutor.map(self.detectContactsOfEntities, chunks):
+            contacts.update(chunkContacts)
+        return contacts
+
+    def tick(self):
+        # entities moved since the last tick are refreshed first, a moved fixed entity wakes the sleeping ones
+        self.refreshMovedEntities()
+        if self.profiler != None:
+            return self.tickProfiled(self.profiler)
+
+        # run update of entities
+        if self.stateStore != None:
+            self.stateStore.applyGravity(self.gravity)
+        entities = list(self.dynamicEntities.values())
+        contacts = {}
+        if self.stateStore != None or self.narrowphaseWorkers > 1:
+            contacts = self.detectAllContacts(entities)
+        if self.stateStore != None:
+            # the blocked flags and friction of all detected entities at once, before any callback runs
+            self.stateStore.applyContacts([gEntity for gEntity in entities if gEntity.id in contacts], contacts)
+
+        # second phase, apply the contacts and run the callbacks in scene order
+        for gEntity in entities:
+            if gEntity.hasCollisionCallBacks():
+                self.dispatchCollisionEvents(gEntity)
+            if gEntity.asleep:
+                self.updateSleepingEntity(gEntity)
+                continue
+            gEntity.update(self, contacts.get(gEntity.id))
+            self.refreshEntity(gEntity)
+        if self.stateStore != None:
+            self.stateStore.applyRestraints()
+        self.tickCount += 1
+
+    def tickProfiled(self, _profiler):
+        # tick measuring the time of the phases and of every entity, kept apart so tick has no overhead without a profiler
+        start = time.perf_counter()
+        if self.stateStore != None:
+            self.stateStore.applyGravity(self.gravity)
+            start = _profiler.stop("physics", start)
+        entities = list(self.dynamicEntities.values())
+        contacts = {}
+        if self.stateStore != None or self.narrowphaseWorkers > 1:
+            contacts = self.detectAllContacts(entities)
+            start = time.perf_counter()
+        if self.stateStore != None:
+            self.stateStore.applyContacts([gEntity for gEntity in entities if gEntity.id in contacts], contacts)
+            start = _profiler.stop("physics", start)
+
+        for gEntity in entities:
+            if gEntity.hasCollisionCallBacks():
+                eventStart = time.perf_counter()
+                self.dispatchCollisionEvents(gEntity)
+                _profiler.stop("events", eventStart)
+            if gEntity.asleep:
+                self.updateSleepingEntity(gEntity)
+                _profiler.count("entitiesSleeping")
+            else:
+                gEntity.update(self, contacts.get(gEntity.id))
+                refreshStart = time.perf_counter()
+                self.refreshEntity(gEntity)
+                _profiler.stop("refresh", refreshStart)
+                _profiler.count("entitiesUpdated")
+            now = time.perf_counter()
+            _profiler.addEntityCost(gEntity.id, now - start)
+            start = now
+        if self.stateStore != None:
+            self.stateStore.applyRestraints()
+            _profiler.stop("restraints", start)
+        _profiler.count("ticks")
+        self.tickCount += 1
+
+    def updateSleepingEntity(self, _entity):
+        # a sleeping entity only runs its callback and wakes up when the callback (or anything else) got it moving
+        if _entity.updateCallBack != None:
+            _entity.updateCallBack(self, _entity)
+        if not self.isResting(_entity):
+            self.wakeEntity(_entity)
+            if _entity.physics != None:
+                _entity.physics.afterUpdate(self, _entity)
+
+    def sweepEntities(self, _timePassed):
+        # returns (entity, start position, clamped displacement) for the entities that would pass a fixed hitbox in this step
+        clamped = []
+        for gEntity in self.dynamicEntities.values():
+            if gEntity.physics == None or gEntity.physics.fixed or gEntity.asleep:
+                continue
+            displacement = gEntity.velocity * _timePassed
+            if max(abs(displacement.x), abs(displacement.y), abs(displacement.z)) < self.contactMargin:
+                # short moves are caught by the contact checks of the next tick
+                continue
+            newDisplacement, newVelocity = self.sweepEntity(gEntity, displacement)
+            if newDisplacement is not displacement:
+                gEntity.velocity = newVelocity
+                clamped.append((gEntity, Vec(gEntity.position.x, gEntity.position.y, gEntity.position.z), newDisplacement))
+        return clamped
+
+    def integrate(self, _timePassed):
+        if self.profiler == None:
+            return self.integrateEntities(_timePassed)
+        start = time.perf_counter()
+        self.integrateEntities(_timePassed)
+        self.profiler.stop("integrate", start)
+
+    def integrateEntities(self, _timePassed):
+        # move the physics entities by their velocity
+        clamped = []
+        if self.useContinuousCollision:
+            clamped = self.sweepEntities(_timePassed)
+        clampedIds = set([gEntity.id for gEntity, startPosition, displacement in clamped])
+
+        if self.stateStore != None:
+            self.stateStore.integrate(_timePassed)
+        for gEntity in self.dynamicEntities.values():
+            if gEntity.physics != None and not gEntity.physics.fixed and not gEntity.asleep:
+                if self.stateStore == None and gEntity.id not in clampedIds:
+                    gEntity.position += gEntity.velocity * _timePassed
+                self.refreshEntity(gEntity)
+        for gEntity, startPosition, displacement in clamped:
+            gEntity.position = startPosition + displacement
+            self.refreshEntity(gEntity)
+        if self.useSleeping:
+            self.updateSleeping(_timePassed)
+
+    def step(self, _timeStep=None):
+        # a single tick followed by integrating a fixed timestep (1/ticksPerSecond by default), independent of the clock
+        timeStep = 1/self.ticksPerSecond if _timeStep == None else _timeStep
+        self.tick()
+        self.integrate(timeStep)
+        self.simulationTime += timeStep
+        if self.recorder != None:
+            self.recorder.record(self)
+
+    def run(self, _steps, _timeStep=None):
+        # runs a given amount of fixed steps as fast as possible
+        for i in range(_steps):
+            self.step(_timeStep)
+
+    def advance(self, _timePassed, _timeStep=None, _maxSteps=None):
+        # adds the passed time to the accumulator and runs as many fixed steps as fit in it, returns the amount of steps done
+        timeStep = 1/self.ticksPerSecond if _timeStep == None else _timeStep
+        self.timeAccumulator += _timePassed
+        steps = 0
+        while self.timeAccumulator >= timeStep:
+            if _maxSteps != None and steps >= _maxSteps:
+                # drop the time that can not be caught up with
+                self.timeAccumulator = 0
+                break
+            self.step(timeStep)
+            self.timeAccumulator -= timeStep
+            steps += 1
+        return steps
 
     def update(self):
+        # fixed timestep mode, step for the time passed since the last update
+        if self.useFixedTimeStep:
+            currentTime = time.time()
+            self.advance(currentTime - self.lastUpdateTime, _maxSteps=self.ticksPerSecond)
+            self.lastUpdateTime = currentTime
+            return
+
         # run update of entities
         if (time.time() - self.lastTickTime) > (1/self.ticksPerSecond):
             self.lastTickTime = time.time()
-            for gEntity in self.entities:
-                gEntity.update(self)
+            self.tick()
             
         # apply physics timely
         timePassed = time.time() - self.lastUpdateTime
         self.lastUpdateTime = time.time()
-        for gEntity in self.entities:
-            if gEntity.physics != None and not gEntity.physics.fixed:
-                gEntity.position += gEntity.velocity * timePassed
+        self.integrate(timePassed)
+        self.simulationTime += timePassed
+        if self.recorder != None:
+            self.recorder.record(self)
         return
 
+# the callback if it can be pickled, otherwise None
+def GetPicklableCallBack(_callBack):
+    try:
+        pickle.dumps(_callBack)
+        return _callBack
+    except (pickle.PicklingError, AttributeError, TypeError):
+        print("could not save callback %s, saved without it" % _callBack)
+        return None
+
+# the (enter, stay, exit) collision callbacks per entity of the objects of a checkpoint, snapshots saved before they existed have none
+def GetCollisionCallBacks(_objects):
+    return _objects.get("collisionCallBacks", [(None, None, None)] * len(_objects["entityIds"]))
+
+# reads a snapshot written by Scene.saveSnapshot, as checkpoint of Scene.rollback
+def ReadSceneSnapshot(_path):
+    with np.load(_path, allow_pickle=False) as data:
+        checkpoint = {name: data[name] for name in data.files}
+    checkpoint["objects"] = pickle.loads(checkpoint["objects"].tobytes())
+    checkpoint["config"] = json.loads(str(checkpoint["config"]))
+    return checkpoint
+
+# creates the scene saved by Scene.saveSnapshot, only load snapshots from trusted sources as the ids and callbacks are pickled
+def LoadSceneSnapshot(_path):
+    checkpoint = ReadSceneSnapshot(_path)
+    scene = Scene(checkpoint["objects"]["sceneId"], _gravity=Vec(*checkpoint["gravity"].tolist()), **checkpoint["config"])
+    scene.rollback(checkpoint)
+    return scene
+
+# the record of one tick in a trajectory file of _entityCount entities
+def GetTrajectoryDtype(_entityCount):
+    return np.dtype([("tick", np.int64), ("time", np.float64), ("position", np.float64, (_entityCount, 3)), ("rotation", np.float64, (_entityCount, 3)),
+                     ("velocity", np.float64, (_entityCount, 3)), ("blocked", np.bool_, (_entityCount, 6))])
+
+# Appends the state of the entities after every tick of a scene to a memory mapped file, for offline analysis and replay (ReplayScene).
+# The file is grown by _chunkTicks records at a time, so recording a tick only copies into the already mapped records. The entities,
+# their hitboxes and the amount of ticks are described in the header file _path + ".json"
+class TrajectoryRecorder:
+    def __init__(self, _path, _chunkTicks=1024):
+        self.path = _path
+        self.chunkTicks = _chunkTicks
+        self.entities = []                      # the recorded entities, the ones in the scene when recording started
+        self.data = None                        # the mapped records
+        self.capacity = 0                       # the amount of records the file holds
+        self.ticks = 0                          # the amount of records written
+        self.rows = None                        # the state store row per entity, reused every tick
+
+    def start(self, _scene):
+        self.entities = list(_scene.entities)
+        self.dtype = GetTrajectoryDtype(len(self.entities))
+        self.rows = np.zeros(len(self.entities), np.intp)
+        self.ticks = 0
+        self.capacity = self.chunkTicks
+        self.data = np.memmap(self.path, self.dtype, "w+", shape=(self.capacity,))
+        self.writeHeader(_scene)
+
+    def writeHeader(self, _scene=None):
+        if _scene != None:
+            self.header = {
+                "entityCount": len(self.entities),
+                "ticksPerSecond": _scene.ticksPerSecond,
+                "entities": [{"id": str(gEntity.id), "name": gEntity.name, "color": gEntity.color,
+                              "hitBoxes": [{"name": hBox.name, "shape": [hBox.shape.x, hBox.shape.y, hBox.shape.z], "relativePos": [hBox.relativePos.x, hBox.relativePos.y, hBox.relativePos.z],
+                                            "relativeRot": [hBox.relativeRot.x, hBox.relativeRot.y, hBox.relativeRot.z]} for hBox in gEntity.hitBoxes]}
+                             for gEntity in self.entities]}
+        self.header["ticks"] = self.ticks
+        with open(self.path + ".json", "w") as file:
+            json.dump(self.header, file)
+
+    def grow(self):
+        # maps the next chunk, numpy extends the file when mapping it larger
+        self.data.flush()
+        self.capacity += self.chunkTicks
+        self.data = np.memmap(self.path, self.dtype, "r+", shape=(self.capacity,))
+
+    def record(self, _scene):
+        if self.ticks == self.capacity:
+            self.grow()
+        record = self.data[self.ticks]
+        record["tick"] = _scene.tickCount
+        record["time"] = _scene.simulationTime
+
+        # copy straight from the state store arrays, unless an entity left it (removed entities keep their last state)
+        store = _scene.stateStore
+        if store != None:
+            for i, gEntity in enumerate(self.entities):
+                self.rows[i] = gEntity.stateIndex
+        if store != None and (len(self.rows) == 0 or self.rows.min() >= 0):
+            np.take(store.position, self.rows, axis=0, out=record["position"])
+            np.take(store.rotation, self.rows, axis=0, out=record["rotation"])
+            np.take(store.velocity, self.rows, axis=0, out=record["velocity"])
+            np.take(store.blocked, self.rows, axis=0, out=record["blocked"])
+        else:
+            positions, rotations, velocities, blocked = record["position"], record["rotation"], record["velocity"], record["blocked"]
+            for i, gEntity in enumerate(self.entities):
+                position, rotation, velocity = gEntity.position, gEntity.rotation, gEntity.velocity
+                positions[i] = (position.x, position.y, position.z)
+                rotations[i] = (rotation.x, rotation.y, rotation.z)
+                velocities[i] = (velocity.x, velocity.y, velocity.z)
+                blocked[i] = gEntity.blockedFlags if gEntity.stateStore == None else store.blocked[gEntity.stateIndex]
+        self.ticks += 1
+
+    def flush(self):
+        # makes the ticks recorded so far readable by a ReplayScene
+        if self.data is not None:
+            self.data.flush()
+            self.writeHeader()
+
+    def close(self):
+        # writes the last ticks and cuts the unused records off the file
+        if self.data is None:
+            return
+        self.flush()
+        self.data = None
+        os.truncate(self.path, self.ticks * self.dtype.itemsize)
+
+# A scene replaying a file of a TrajectoryRecorder without running any physics. Its entities (without physics, with the ids as strings)
+# can be drawn by any renderer, update plays the recording at _speed times real time and seek jumps straight to a tick
+class ReplayScene(Scene):
+    def __init__(self, _path, _speed=1, _loop=False):
+        with open(_path + ".json") as file:
+            self.header = json.load(file)
+        Scene.__init__(self, _path, _ticksPerSecond=self.header["ticksPerSecond"])
+        self.data = np.memmap(_path, GetTrajectoryDtype(self.header["entityCount"]), "r", shape=(self.header["ticks"],))
+        self.speed = _speed                     # the playback speed, 1 is real time and negative plays backwards
+        self.loop = _loop                       # if true playing starts over at the end
+        self.playing = True
+        self.currentTick = -1                   # the index of the record shown
+        self.playTime = 0                       # the simulation time played to
+
+        self.replayEntities = []
+        for description in self.header["entities"]:
+            gEntity = Entity(description["name"], description["id"])
+            gEntity.color = tuple(description["color"]) if isinstance(description["color"], list) else description["color"]
+            for hitBox in description["hitBoxes"]:
+                gEntity.addHitBox(HitBox(hitBox["name"], gEntity.id, Vec(*hitBox["shape"]), Vec(*hitBox["relativePos"]), Vec(*hitBox["relativeRot"])))
+            self.addEntity(gEntity)
+            self.replayEntities.append(gEntity)
+        if len(self.data) != 0:
+            self.seek(0)
+
+    def getTickCount(self):
+        return len(self.data)
+
+    def seek(self, _tick):
+        # sets the entities to the state after the given recorded tick (index into the recording)
+        tick = min(max(int(_tick), 0), len(self.data) - 1)
+        record = self.data[tick]
+        for gEntity, position, rotation, velocity, blocked in zip(self.replayEntities, record["position"].tolist(), record["rotation"].tolist(),
+                                                                  record["velocity"].tolist(), record["blocked"].tolist()):
+            gEntity.position = Vec(*position)
+            gEntity.rotation = Vec(*rotation)
+            gEntity.velocity = Vec(*velocity)
+            gEntity.blockedFlags = blocked
+            self.refreshEntity(gEntity)
+        self.currentTick = tick
+        self.tickCount = int(record["tick"])
+        self.simulationTime = float(record["time"])
+        self.playTime = self.simulationTime
+
+    def seekTime(self, _time):
+        # seeks to the last tick recorded at or before the given simulation time
+        tick = int(np.searchsorted(self.data["time"], _time, side="right")) - 1
+        self.seek(tick)
+        self.playTime = _time
+
+    def play(self, _speed=None):
+        if _speed != None:
+            self.speed = _speed
+        self.playing = True
+        self.lastUpdateTime = time.time()
+
+    def pause(self):
+        self.playing = False
+
+    def step(self, _timeStep=None):
+        # shows the next recorded tick (the previous one when playing backwards)
+        self.seek(self.currentTick + (1 if self.speed >= 0 else -1))
+
+    def update(self):
+        # advances the played time by the time passed since the last update
+        currentTime = time.time()
+        timePassed = currentTime - self.lastUpdateTime
+        self.lastUpdateTime = currentTime
+        if not self.playing or len(self.data) == 0:
+            return
+        playTime = self.playTime + timePassed * self.speed
+        startTime, endTime = float(self.data[0]["time"]), float(self.data[-1]["time"])
+        if self.loop and playTime > endTime:
+            playTime = startTime + (playTime - endTime)
+        elif self.loop and playTime < startTime:
+            playTime = endTime - (startTime - playTime)
+        self.seekTime(min(max(playTime, startTime), endTime))
+
+# The renderer interface used by the engine, a renderer draws a scene on update, presents it on show and collects the pressed keys
+class Renderer:
+    def __init__(self):
+        self.keyBuffer = [''] * 5                                               # currently pressed keys, a maximum of 10
+        self.profiler = None                                                    # optional Profiler timing the drawing and showing
+        self.showProfiler = False                                               # if true renderers drawing text show the statistics of the profiler
+
+    def setProfiler(self, _profiler):
+        self.profiler = _profiler
+
+    def update(self, _scene):
+        # returns false to stop the engine
+        return True
+
+    def show(self):
+        return
+
+    def close(self):
+        return
+
+# A renderer that draws nothing and polls no window, used to run the engine headless. Keys can be fed by pressKey
+class NullRenderer(Renderer):
+    def __init__(self):
+        Renderer.__init__(self)
+        self.pendingKeys = []                                                   # keys to put in the key buffer on the next update
+
+    def pressKey(self, _key_str):
+        self.pendingKeys.append(ord(_key_str))
+
+    def update(self, _scene):
+        key = self.pendingKeys.pop(0) if len(self.pendingKeys) != 0 else ''
+        self.keyBuffer.append(key)
+        self.keyBuffer.pop(0)
+        return True
+
+# A fixed ring of preallocated frames, each frame is either free, being drawn, ready to be shown or displayed
+class FrameRing:
+    def __init__(self, _baseFrame, _count=3):
+        self.frames = [_baseFrame.copy() for i in range(max(2, _count))]
+        self.displayed = 0                                                      # the frame currently shown
+        self.free = deque(range(1, len(self.frames)))                           # frames that can be drawn into
+        self.ready = deque()                                                    # drawn frames waiting to be shown, oldest first
+        self.condition = threading.Condition()
+        self.droppedFrames = 0                                                  # drawn frames that were never shown
+
+    def acquire(self, _block=False):
+        # returns a frame index to draw into, when none is free it waits (_block) or takes back the oldest frame not shown yet
+        with self.condition:
+            while len(self.free) == 0:
+                if not _block and len(self.ready) != 0:
+                    self.droppedFrames += 1
+                    return self.ready.popleft()
+                self.condition.wait()
+            return self.free.popleft()
+
+    def publish(self, _index):
+        with self.condition:
+            self.ready.append(_index)
+            self.condition.notify_all()
+
+    def present(self, _latestOnly=True):
+        # makes the next ready frame (or only the latest, dropping older ones) the displayed one and returns it
+        with self.condition:
+            if len(self.ready) != 0:
+                while _latestOnly and len(self.ready) > 1:
+                    self.free.append(self.ready.popleft())
+                    self.droppedFrames += 1
+                self.free.append(self.displayed)
+                self.displayed = self.ready.popleft()
+                self.condition.notify_all()
+            return self.frames[self.displayed]
+
+    def dropFrame(self):
+        # counts a frame that was dropped before it was drawn
+        with self.condition:
+            self.droppedFrames += 1
+
 # The renderer class (opencv for ease)
-class RendererCv:
-    def __init__(self, _2d=False, _windowShape=Vec(1020, 720), _cameraPosition=Vec(0,0,0), _cameraRotation=Vec(0,0,0)):
-        self.windowShape = _windowShape                                         # the size of the window/ image to draw
+class RendererCv(Renderer):
+    # the 12 edges of a hitbox as pairs of corner indices (order of HitBox.getBoundingRect), front, back then sides
+    boxEdges = np.array([[0, 1], [0, 2], [3, 1], [2, 3], [4, 5], [4, 6], [7, 5], [6, 7], [0, 4], [1, 5], [2, 6], [3, 7]])
+
+    def __init__(self, _2d=False, _windowShape=Vec(1020, 720), _cameraPosition=Vec(0,0,0), _cameraRotation=Vec(0,0,0), _showWindow=True,
+                 _threaded=False, _frameBufferCount=3, _framePolicy="drop", _showProfiler=False):
+        Renderer.__init__(self)
+        ImportCv2()
+        self.windowShape = _windowShape.copy()                                  # the size of the window/ image to draw, own copies as Vecs may be changed in place
         self.baseFrame = np.zeros((self.windowShape.y, self.windowShape.x), np.uint8)     # a default image corresponding the window sizes
         self.lastFrame = self.baseFrame                                         # the frame to be presented                                     
-        self.keyBuffer = [''] * 5                                              # currently pressed keys, a maximum of 10
-        self.backBuffer = []                                                    # the images that are ready to be presented
+        self.frameRing = FrameRing(self.baseFrame, _frameBufferCount)           # the preallocated frames that are drawn into and presented
+        self.showWindow = _showWindow                                           # if false frames are only drawn into lastFrame (offscreen) and no keys are polled
+        self.threaded = _threaded                                               # if true frames are drawn on a worker thread from snapshots of the scene
+        self.framePolicy = _framePolicy                                         # "drop" skips frames the drawing can not keep up with, "block" waits for the drawing
+        self.snapshotQueue = queue.Queue(1)                                     # the scene snapshot waiting to be drawn by the worker
+        self.drawThread = None
         self.twoD = _2d
-        self.cameraPosition = _cameraPosition
-        self.cameraRotation = _cameraRotation
+        self.cameraPosition = _cameraPosition.copy()
+        self.cameraRotation = _cameraRotation.copy()
+        self.cameraRotationKey = None                                          # the camera rotation the cached camera matrix was made for
+        self.cameraMatrix = None
+        self.showProfiler = _showProfiler
+        self.reportedDroppedFrames = 0                                          # the dropped frames already counted by the profiler
+        self.entityBounds = {}                                                  # entity id -> (pose key, (8,3) corners of the world bounds), kept between frames
+        self.cullMargin = 1                                                     # pixels around the window within which entities are still drawn
     
+    def getCameraMatrix(self):
+        key = (self.cameraRotation.x, self.cameraRotation.y, self.cameraRotation.z)
+        if key != self.cameraRotationKey:
+            self.cameraMatrix = GetRotationMatrix(self.cameraRotation.x, self.cameraRotation.y, self.cameraRotation.z)
+            self.cameraRotationKey = key
+        return self.cameraMatrix
+
+    def getCameraPose(self):
+        # the camera matrix and position as they are now, drawing from a snapshot uses the pose the snapshot was taken with
+        return (self.getCameraMatrix(), (self.cameraPosition.x, self.cameraPosition.y, self.cameraPosition.z))
+
+    def transformPositionsToViewPoints(self, _positions, _cameraPose=None):
+        # batch version of transformPositionToViewPoint for an (N,3) array, returns (N,2) int points and a mask of the points that could be projected
+        # _cameraPose is a (matrix, position) of getCameraPose, the current camera if None
+        cameraMatrix, cameraPosition = _cameraPose if _cameraPose != None else self.getCameraPose()
+        positions = _positions @ cameraMatrix.T + cameraPosition
+
+        # apply aspectratio
+        positions[:, 1] *= self.windowShape.y/self.windowShape.x
+
+        # apply perspective transformation in case of 3D, assuming view will never rotate but rather the world
+        # points behind the camera (z > 0) can not be projected
+        inFront = True
+        if not self.twoD:
+            z = positions[:, 2:3]
+            inFront = z[:, 0] <= 0
+            with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+                positions = positions / -(z/250)
+
+        # move coordinates to window space
+        points = positions[:, :2] + (self.windowShape.x/2, self.windowShape.y/2)
+        valid = np.all(np.isfinite(points), axis=1) & inFront
+        points = np.clip(np.where(valid[:, None], points, 0), -(1 << 30), 1 << 30).astype(np.int32)
+        return points, valid
+
     def transformPositionToViewPoint(self, _position):
-        position = _position.getRotatedVec(self.cameraRotation.x, self.cameraRotation.y, self.cameraRotation.z) + self.cameraPosition
+        # returns None for positions that can not be projected (behind the camera)
+        position = GetRotation(self.cameraRotation.x, self.cameraRotation.y, self.cameraRotation.z).apply(_position)
+        position += self.cameraPosition
 
         # apply aspectratio
         position.y *= self.windowShape.y/self.windowShape.x
 
         # apply perspective transformation in case of 3D, assuming view will never rotate but rather the world
         if not self.twoD:
-            if position.z <= 0:
-                position /= -(position.z/250)
-            else:
-                position *= (position.z * 250)
+            if position.z >= 0:
+                return None
+            position /= -(position.z/250)
         
         # move coordinates to window space
         position += (self.windowShape/2)
@@ -480,72 +2800,197 @@ class RendererCv:
         return point
 
     def show(self):
+        start = time.perf_counter()
+
         # show the image
-        if len(self.backBuffer) != 0:
-            self.lastFrame = self.backBuffer.pop(0)
+        self.lastFrame = self.frameRing.present(self.framePolicy == "drop")
  
-        cv2.imshow("Window", self.lastFrame)
+        if self.showWindow:
+            cv2.imshow("Window", self.lastFrame)
+
+        if self.profiler != None:
+            self.profiler.stop("show", start)
+            droppedFrames = self.frameRing.droppedFrames
+            self.profiler.count("framesDropped", droppedFrames - self.reportedDroppedFrames)
+            self.reportedDroppedFrames = droppedFrames
 
     def update(self, _scene):
+        if self.profiler == None:
+            return self.updateFrame(_scene)
+        start = time.perf_counter()
+        result = self.updateFrame(_scene)
+        self.profiler.stop("render", start)
+        return result
+
+    def updateFrame(self, _scene):
         # update input
-        key = cv2.waitKey(1) & 0xFF
-        self.keyBuffer.append(key)
-        self.keyBuffer.pop(0)
+        if self.showWindow:
+            key = cv2.waitKey(1) & 0xFF
+            self.keyBuffer.append(key)
+            self.keyBuffer.pop(0)
+
+        snapshot = self.takeSnapshot(_scene)
+        if not self.threaded:
+            self.drawSnapshot(snapshot)
+            return True
 
-        # draw the entities 
-        newFrame = self.baseFrame.copy()
-        for gEntity in _scene.entities:
-            for hBox in gEntity.hitBoxes:
-                f_leftTop, f_rightTop, f_leftBot, f_rightBot, b_leftTop, b_rightTop, b_leftBot, b_rightBot = hBox.getBoundingRect(gEntity.position, gEntity.rotation)
-
-                p_flT = self.transformPositionToViewPoint(f_leftTop)
-                p_frT = self.transformPositionToViewPoint(f_rightTop)
-                p_frB = self.transformPositionToViewPoint(f_rightBot)
-                p_flB = self.transformPositionToViewPoint(f_leftBot)
-
-                p_blT = self.transformPositionToViewPoint(b_leftTop)
-                p_brT = self.transformPositionToViewPoint(b_rightTop)
-                p_brB = self.transformPositionToViewPoint(b_rightBot)
-                p_blB = self.transformPositionToViewPoint(b_leftBot)
-
-                # draw front
-                cv2.line(newFrame, p_flT, p_frT, gEntity.color, 1)
-                cv2.line(newFrame, p_flT, p_flB, gEntity.color, 1)
-                cv2.line(newFrame, p_frB, p_frT, gEntity.color, 1)
-                cv2.line(newFrame, p_flB, p_frB, gEntity.color, 1)
-
-                # draw back
-                cv2.line(newFrame, p_blT, p_brT, gEntity.color, 1)
-                cv2.line(newFrame, p_blT, p_blB, gEntity.color, 1)
-                cv2.line(newFrame, p_brB, p_brT, gEntity.color, 1)
-                cv2.line(newFrame, p_blB, p_brB, gEntity.color, 1)
-
-                # draw sides
-                cv2.line(newFrame, p_flT, p_blT, gEntity.color, 1)
-                cv2.line(newFrame, p_frT, p_brT, gEntity.color, 1)
-                cv2.line(newFrame, p_flB, p_blB, gEntity.color, 1)
-                cv2.line(newFrame, p_frB, p_brB, gEntity.color, 1)
-
-                # <TODO draw z axis in smaller scale>
-                 
-        self.backBuffer.append(newFrame)
+        # hand the snapshot to the draw thread, replacing one it did not start on yet when dropping frames
+        if self.drawThread == None:
+            self.drawThread = threading.Thread(target=self.drawLoop, daemon=True)
+            self.drawThread.start()
+        if self.framePolicy == "drop":
+            try:
+                self.snapshotQueue.get_nowait()
+                self.frameRing.dropFrame()
+            except queue.Empty:
+                pass
+            self.snapshotQueue.put_nowait(snapshot)
+        else:
+            self.snapshotQueue.put(snapshot)
         return True
 
+    def getEntityBoundCorners(self, _entity, _bounds):
+        # the corners of the world bounds of an entity, reused from the last frame (self.entityBounds) while the entity did not change
+        key = _entity.getPoseKey()
+        entry = self.entityBounds.get(_entity.id)
+        if entry == None or entry[0] != key:
+            # from the cached hitbox corners, which drawing the entity reuses
+            corners = np.concatenate([hBox.getWorldCorners(_entity.position, _entity.rotation) for hBox in _entity.hitBoxes])
+            entry = (key, np.where(HitBox.cornerSigns < 0, corners.min(axis=0), corners.max(axis=0)))
+        _bounds[_entity.id] = entry
+        return entry[1]
+
+    def getVisibleEntities(self, _entities, _cameraPose=None):
+        # the entities with hitboxes whose world bounds are (partly) within the view frustum, an entity is left out when all corners
+        # of its bounds are outside of the same plane of the frustum
+        entities = [gEntity for gEntity in _entities if len(gEntity.hitBoxes) != 0]
+        bounds = {}
+        if len(entities) == 0:
+            self.entityBounds = bounds
+            return entities
+        corners = np.stack([self.getEntityBoundCorners(gEntity, bounds) for gEntity in entities])
+        self.entityBounds = bounds
+
+        # into camera space with the aspect ratio applied, like transformPositionsToViewPoints
+        cameraMatrix, cameraPosition = _cameraPose if _cameraPose != None else self.getCameraPose()
+        positions = corners @ cameraMatrix.T + cameraPosition
+        x = positions[:, :, 0]
+        y = positions[:, :, 1] * (self.windowShape.y/self.windowShape.x)
+        halfWidth = self.windowShape.x/2 + self.cullMargin
+        halfHeight = self.windowShape.y/2 + self.cullMargin
+        if self.twoD:
+            planes = np.stack([x + halfWidth, halfWidth - x, y + halfHeight, halfHeight - y], axis=2)
+            outside = np.any(np.all(planes < 0, axis=1), axis=1)
+        else:
+            # a point in front of the camera at depth d is projected to x * 250/d, so the side planes are |250 x| = halfWidth * d
+            depth = -positions[:, :, 2]
+            planes = np.stack([250 * x + halfWidth * depth, halfWidth * depth - 250 * x, 250 * y + halfHeight * depth, halfHeight * depth - 250 * y], axis=2)
+            outside = np.any(np.all(planes < 0, axis=1), axis=1) | np.all(depth <= 0, axis=1)
+        return [gEntity for gEntity, culled in zip(entities, outside.tolist()) if not culled]
+
+    def takeSnapshot(self, _scene):
+        # copies the corners and colors of the hitboxes of the visible entities, the camera pose and the profiler text, so drawing does not depend
+        # on the scene or the camera anymore
+        corners = []
+        colorGroups = {}
+        entities = _scene.entities
+        cameraPose = self.getCameraPose()
+        visibleEntities = self.getVisibleEntities(entities, cameraPose)
+        if self.profiler != None:
+            self.profiler.count("entitiesCulled", len(entities) - len(visibleEntities))
+        for gEntity in visibleEntities:
+            for hBox in gEntity.hitBoxes:
+                colorGroups.setdefault(gEntity.color, []).append(len(corners))
+                corners.append(hBox.getWorldCorners(gEntity.position, gEntity.rotation))
+        overlayLines = []
+        if self.showProfiler and self.profiler != None:
+            overlayLines = self.profiler.getOverlayLines()
+        if len(corners) == 0:
+            return (np.zeros((0, 3)), colorGroups, overlayLines, cameraPose)
+        return (np.concatenate(corners), colorGroups, overlayLines, cameraPose)
+
+    def drawSnapshot(self, _snapshot):
+        # draws a snapshot into a free frame of the ring (cleared in place) and queues it for show
+        corners, colorGroups, overlayLines, cameraPose = _snapshot
+        index = self.frameRing.acquire(self.threaded and self.framePolicy == "block")
+        newFrame = self.frameRing.frames[index]
+        newFrame[:] = self.baseFrame
+
+        # project all corners at once
+        if len(corners) != 0:
+            points, valid = self.transformPositionsToViewPoints(corners, cameraPose)
+            points = points.reshape(-1, 8, 2)
+            valid = valid.reshape(-1, 8)
+
+            # draw the edges of all boxes with the same color in one call, skipping edges with points that could not be projected
+            for color, boxIndices in colorGroups.items():
+                lines = points[boxIndices][:, self.boxEdges].reshape(-1, 2, 2)
+                linesValid = np.all(valid[boxIndices][:, self.boxEdges], axis=2).reshape(-1)
+                cv2.polylines(newFrame, list(lines[linesValid]), False, color, 1)
+
+            # <TODO draw z axis in smaller scale>
+
+        for i, line in enumerate(overlayLines):
+            cv2.putText(newFrame, line, (5, 15 + 15 * i), cv2.FONT_HERSHEY_PLAIN, 1, 255, 1)
+
+        self.frameRing.publish(index)
+
+    def drawLoop(self):
+        # worker thread drawing the snapshots, stopped by a None snapshot
+        while True:
+            snapshot = self.snapshotQueue.get()
+            if snapshot == None:
+                return
+            self.drawSnapshot(snapshot)
+
+    def close(self):
+        # stops the draw thread
+        if self.drawThread != None:
+            self.snapshotQueue.put(None)
+            self.drawThread.join()
+            self.drawThread = None
+
 
 # The controller class
 class Engine:
-    def __init__(self, _renderer=RendererCv()):
+    def __init__(self, _renderer=None):
         self.scenes = []                                                        # the scenes that be loaded
         self.currentSceneIndex = -1                                             # the scene to be shown, if -1 nothing is shown and engine stops
-        self.renderer = _renderer
+        self.renderer = _renderer                                               # any Renderer, use a NullRenderer to run without window or opencv
+        if self.renderer == None:
+            self.renderer = RendererCv()
+        self.profiler = None                                                    # the Profiler shared by the scenes and the renderer while profiling
         
     def addScene(self, _newScene, _setAsCurrentScene=False):
         self.scenes.append(_newScene)
+        if self.profiler != None:
+            _newScene.setProfiler(self.profiler)
         scene_index = len(self.scenes) - 1
         if _setAsCurrentScene:
             self.currentSceneIndex = scene_index
         return scene_index
 
+    def enableProfiling(self, _window=120, _showOverlay=False):
+        # measures the scenes and the renderer with a shared profiler, the statistics cover the last _window frames
+        self.profiler = Profiler(_window)
+        for gScene in self.scenes:
+            gScene.setProfiler(self.profiler)
+        self.renderer.setProfiler(self.profiler)
+        self.renderer.showProfiler = self.renderer.showProfiler or _showOverlay
+        return self.profiler
+
+    def disableProfiling(self):
+        self.profiler = None
+        for gScene in self.scenes:
+            gScene.setProfiler(None)
+        self.renderer.setProfiler(None)
+
+    def getProfilingStats(self):
+        # the rolling statistics per frame, None when not profiling
+        if self.profiler == None:
+            return None
+        return self.profiler.getStats()
+
     def checkKeyPress(self, _key_str):
         for key in self.renderer.keyBuffer:
             if key == ord(_key_str):
@@ -569,8 +3014,152 @@ class Engine:
         # update the renderer with the new scene
         return self.renderer.update(self.scenes[self.currentSceneIndex])
 
-    def run(self):
-        while True:
+    def run(self, _maxUpdates=None):
+        # runs until the renderer or the exit key stops the engine, or until the given amount of updates is done
+        updates = 0
+        while _maxUpdates == None or updates < _maxUpdates:
             if not self.update():
                 break
-            self.renderer.show()
\ No newline at end of file
+            self.renderer.show()
+            if self.profiler != None:
+                self.profiler.endFrame()
+            updates += 1
+        self.renderer.close()
+
+
+# runs one job of a BatchSimulator, module level so a process pool can pickle it
+def SimulateSceneJob(_index, _sceneSource, _steps, _timeStep, _sampleEvery):
+    scene = _sceneSource if isinstance(_sceneSource, Scene) else _sceneSource()
+    entities = scene.entities
+    samples = []
+    for i in range(_steps):
+        if _sampleEvery > 0 and i % _sampleEvery == 0:
+            samples.append([(gEntity.position.x, gEntity.position.y, gEntity.position.z, gEntity.velocity.x, gEntity.velocity.y, gEntity.velocity.z) for gEntity in entities])
+        scene.step(_timeStep)
+
+    result = {"index": _index, "ticks": scene.tickCount, "simulationTime": scene.simulationTime, "entities": {}}
+    for gEntity in scene.entities:
+        result["entities"][gEntity.id] = {
+            "name": gEntity.name,
+            "position": (float(gEntity.position.x), float(gEntity.position.y), float(gEntity.position.z)),
+            "rotation": (float(gEntity.rotation.x), float(gEntity.rotation.y), float(gEntity.rotation.z)),
+            "velocity": (float(gEntity.velocity.x), float(gEntity.velocity.y), float(gEntity.velocity.z)),
+            "blocked": tuple([getattr(gEntity, name) for name in EntityStateStore.blockedNames])}
+    if _sampleEvery > 0:
+        # (samples, entities, 6) array of positions and velocities of the entities present at the start
+        result["trajectoryIds"] = [gEntity.id for gEntity in entities]
+        result["trajectory"] = np.array(samples).reshape(len(samples), len(entities), 6)
+    return result
+
+# Steps many independent scenes headless on a process pool, for parameter sweeps and offline batches
+class BatchSimulator:
+    def __init__(self, _maxWorkers=None):
+        self.maxWorkers = _maxWorkers           # the amount of processes, the cpu count by default
+
+    def run(self, _sceneSources, _steps, _timeStep=None, _sampleEvery=0):
+        # yields the result of every scene as soon as it is done, a source is a Scene or a picklable function
+        # building one (like a CallBack), results hold the final entity states and every _sampleEvery steps a trajectory sample
+        with concurrent.futures.ProcessPoolExecutor(self.maxWorkers) as executor:
+            futures = [executor.submit(SimulateSceneJob, i, source, _steps, _timeStep, _sampleEvery) for i, source in enumerate(_sceneSources)]
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+
+    def runOrdered(self, _sceneSources, _steps, _timeStep=None, _sampleEvery=0):
+        # like run, but returns all results in the order of the sources
+        results = list(self.run(_sceneSources, _steps, _timeStep, _sampleEvery))
+        return sorted(results, key=lambda result: result["index"])
+
+# the scene copy of a narrowphase worker process, filled by DetectContactsJob
+NarrowphaseWorkerScene = {"key": None}
+
+def DetectContactsJob(_sceneKey, _scenePath, _posePath, _indices):
+    # runs in a process of a NarrowphaseProcessPool, returns (index, blocked, index of the ground or -1) for the entities at the indices
+    state = NarrowphaseWorkerScene
+    if state["key"] != _sceneKey:
+        with open(_scenePath, "rb") as file:
+            sceneId, config, checkpoint = pickle.load(file)
+        scene = Scene(sceneId, **config)
+        scene.rollback(checkpoint)
+        entities = scene.entities
+        state.update({"key": _sceneKey, "scene": scene, "entities": entities, "indices": {gEntity.id: i for i, gEntity in enumerate(entities)},
+                      "poses": np.memmap(_posePath, np.float64, "r", shape=(2, len(entities), 3))})
+
+    # the rebuilt scene keeps its entities in scene order in the first rows of its state store
+    scene, entities, indices, poses = state["scene"], state["entities"], state["indices"], state["poses"]
+    scene.stateStore.position[:len(entities)] = poses[0]
+    scene.stateStore.rotation[:len(entities)] = poses[1]
+    result = []
+    for i in _indices:
+        blocked, ground = entities[i].physics.detectContacts(scene, entities[i])
+        result.append((i, blocked, indices[ground.id] if ground != None else -1))
+    return result
+
+# Detects the contacts of a state store scene on a process pool, using every core. Each process keeps a copy of the scene, rebuilt from a
+# checkpoint whenever more than the poses of the dynamic entities changed (Scene.getNarrowphaseLayoutKey), and reads the poses of every
+# tick from a memory mapped file (in /dev/shm where there is one). The copies run the same detection, the results equal serial stepping
+class NarrowphaseProcessPool:
+    def __init__(self, _workers):
+        self.workers = _workers
+        self.executor = concurrent.futures.ProcessPoolExecutor(_workers)
+        self.directory = tempfile.mkdtemp(prefix="PyPhyEngine", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+        self.layoutKey = None                   # the layout key of the scene the copy was written for
+        self.sceneCount = 0                     # increasing counter naming the copies
+        self.scenePath = None
+        self.posePath = None
+        self.poses = None                       # (2, entities, 3) positions and rotations in scene order, shared with the processes
+        self.rows = None                        # the state store row per entity in scene order
+        self.entityIndices = None               # id -> index in scene order
+        self.finalizer = weakref.finalize(self, NarrowphaseProcessPool.release, self.executor, self.directory)
+
+    @staticmethod
+    def release(_executor, _directory):
+        _executor.shutdown()
+        shutil.rmtree(_directory, True)
+
+    def close(self):
+        self.finalizer()
+
+    def writeScene(self, _scene, _layoutKey):
+        # the processes only detect contacts, the callbacks are left out as they may not be picklable
+        checkpoint = _scene.checkpoint()
+        objects = checkpoint["objects"]
+        objects["callBacks"] = [None] * len(objects["entityIds"])
+        objects["collisionCallBacks"] = [(None, None, None)] * len(objects["entityIds"])
+        config = _scene.getConfig()
+        config["_narrowphaseWorkers"] = 1
+        config["_narrowphaseProcesses"] = False
+
+        oldPaths = [self.scenePath, self.posePath]
+        self.sceneCount += 1
+        self.scenePath = os.path.join(self.directory, "scene%d.pickle" % self.sceneCount)
+        self.posePath = os.path.join(self.directory, "poses%d.bin" % self.sceneCount)
+        with open(self.scenePath, "wb") as file:
+            pickle.dump((_scene.id, config, checkpoint), file, pickle.HIGHEST_PROTOCOL)
+        entities = _scene.entities
+        self.poses = np.memmap(self.posePath, np.float64, "w+", shape=(2, len(entities), 3))
+        self.rows = np.array([gEntity.stateIndex for gEntity in entities], np.int64)
+        self.entityIndices = {gEntity.id: i for i, gEntity in enumerate(entities)}
+        self.layoutKey = _layoutKey
+        for path in oldPaths:
+            if path != None:
+                os.remove(path)
+
+    def detect(self, _scene, _entities):
+        # returns id -> (blocked, ground) like Scene.detectAllContacts
+        layoutKey = _scene.getNarrowphaseLayoutKey()
+        if layoutKey != self.layoutKey:
+            self.writeScene(_scene, layoutKey)
+        self.poses[0] = _scene.stateStore.position[self.rows]
+        self.poses[1] = _scene.stateStore.rotation[self.rows]
+
+        # split by region along x, neighbouring entities mostly test against the same fixed geometry
+        indices = np.array([self.entityIndices[gEntity.id] for gEntity in _entities], np.int64)
+        indices = indices[np.argsort(self.poses[0][indices, 0], kind="stable")]
+        chunks = [chunk.tolist() for chunk in np.array_split(indices, min(self.workers, len(indices)))]
+        sceneKey = (self.directory, self.sceneCount)
+        entities = _scene.entities
+        contacts = {}
+        for chunkContacts in self.executor.map(DetectContactsJob, [sceneKey] * len(chunks), [self.scenePath] * len(chunks), [self.posePath] * len(chunks), chunks):
+            for i, blocked, ground in chunkContacts:
+                contacts[entities[i].id] = (blocked, entities[ground] if ground != -1 else None)
+        return contacts
@@ -0,0 +1,168 @@
+import argparse
+import json
+import platform
+import random
+import time
+
+import numpy as np
+
+from PyPhyEngine import Scene, Entity, EntityPhysics, Vec, RendererCv
+
+# Headless and deterministic benchmarks of the engine, results are written as json
+# usage: python run_benchmarks.py [--quick] [--output results.json] [--case step ...]
+
+# the scene modes the step benchmark is run in
+SCENE_MODES = {
+    "default": {},
+    "spatialHash": {"_useSpatialHash": True},
+    "staticBVH": {"_useStaticBVH": True},
+    "stateStore": {"_useStateStore": True, "_useStaticBVH": True},
+    "sleeping": {"_useStaticBVH": True, "_useSleeping": True},
+    "sat": {"_useStaticBVH": True, "_collisionMode": "sat"},
+}
+
+# builds the multi hitbox character of run_test_scene.py, without the keyboard callback
+def CreateCharacter(_id, _position):
+    character = Entity(_name="character%d" % _id, _id=_id, _position=_position, _physics=EntityPhysics(_fixed=False, _maxVelocity=Vec(250, 1000, 250)))
+    character.createHitBox(Vec(20, 40, 20), Vec(0, 0, 0), _name="torso")
+    character.createHitBox(Vec(10, 15, 20), Vec(-10, 25, 0), _name="feetl")
+    character.createHitBox(Vec(10, 15, 20), Vec(10, 25, 0), _name="feetr")
+    character.createHitBox(Vec(20, 10, 20), Vec(-20, -20, 0), _name="handl")
+    character.createHitBox(Vec(20, 10, 20), Vec(20, -20, 0), _name="handr")
+    character.createHitBox(Vec(15, 20, 20), Vec(0, -30, 0), _name="head")
+    return character
+
+# builds a scene of _characters characters moving over a ground with _boxes fixed boxes, the same for the same seed
+def CreateBenchmarkScene(_characters, _boxes, _seed=0, **_sceneArguments):
+    rnd = random.Random(_seed)
+    width = max(600, 40 * (_characters + _boxes))
+    scene = Scene(_id=_seed, _gravity=Vec(0, 3, 0), **_sceneArguments)
+
+    fixedPhysics = EntityPhysics(_fixed=True, _friction=Vec(3, 0, 3))
+    ground = Entity(_name="ground", _id=0, _position=Vec(0, 300, 0), _physics=fixedPhysics)
+    ground.createHitBox(Vec(2 * width, 20, 600))
+    scene.addEntity(ground)
+
+    for i in range(_boxes):
+        box = Entity(_name="box%d" % i, _id=1000000 + i, _position=Vec(rnd.uniform(-width, width), rnd.uniform(150, 270), rnd.uniform(-250, 250)), _physics=fixedPhysics)
+        box.createHitBox(Vec(40, 40, 40), Vec(0, 0, 0), Vec(0, rnd.choice([0, 0, 0.5]), 0))
+        scene.addEntity(box)
+
+    for i in range(_characters):
+        character = CreateCharacter(i + 1, Vec(rnd.uniform(-width, width), rnd.uniform(-100, 200), rnd.uniform(-250, 250)))
+        character.velocity = Vec(rnd.uniform(-250, 250), 0, rnd.uniform(-250, 250))
+        scene.addEntity(character)
+    return scene
+
+# builds a fresh workload with _setup and times _calls calls of it, the best of _repeats runs is kept so the same work is
+# measured every time and noise from other processes only makes runs slower
+def TimeCalls(_setup, _calls, _repeats=3):
+    best = None
+    for i in range(_repeats):
+        function = _setup()
+        start = time.perf_counter()
+        for j in range(_calls):
+            function()
+        elapsed = time.perf_counter() - start
+        if best == None or elapsed < best:
+            best = elapsed
+    return best
+
+def BenchmarkStep(_characters, _boxes, _mode, _calls):
+    def setup():
+        scene = CreateBenchmarkScene(_characters, _boxes, **SCENE_MODES[_mode])
+        scene.step(0.001)   # builds the lazy indices
+        return lambda: scene.step(0.001)
+    seconds = TimeCalls(setup, _calls)
+    return {"ticks": _calls, "seconds": seconds, "ticksPerSecond": _calls / seconds}
+
+def BenchmarkQueries(_characters, _boxes, _calls, _batchSize=64):
+    # the point queries of a probe, spread over the scene
+    def setup():
+        scene = CreateBenchmarkScene(_characters, _boxes)
+        rnd = random.Random(1)
+        width = max(600, 40 * (_characters + _boxes))
+        positions = [Vec(rnd.uniform(-width, width), rnd.uniform(-100, 310), rnd.uniform(-300, 300)) for i in range(_batchSize)]
+        return lambda: scene.getEntiesMeetingPositions(positions)
+    seconds = TimeCalls(setup, _calls)
+    return {"calls": _calls, "positionsPerCall": _batchSize, "seconds": seconds, "queriesPerSecond": _calls * _batchSize / seconds}
+
+def BenchmarkBoundingRect(_calls):
+    # cached is the same pose every call, moving changes the pose every call so the corners are recomputed
+    rotation = Vec(0, 0.3, 0)
+    def setupCached():
+        hitBox = CreateCharacter(1, Vec(0, 0, 0)).hitBoxes[0]
+        position = Vec(0, 0, 0)
+        return lambda: hitBox.getBoundingRect(position, rotation)
+    def setupMoving():
+        hitBox = CreateCharacter(1, Vec(0, 0, 0)).hitBoxes[0]
+        position = Vec(0, 0, 0)
+        def moveAndGet():
+            position.x += 1
+            hitBox.getBoundingRect(position, rotation)
+        return moveAndGet
+    return {"calls": _calls, "cachedSecondsPerCall": TimeCalls(setupCached, _calls) / _calls, "movingSecondsPerCall": TimeCalls(setupMoving, _calls) / _calls}
+
+def BenchmarkRender(_characters, _boxes, _calls, _repeats=3):
+    # draws into the offscreen frame without a window. The scene is stepped before every frame so every frame changes, the stepping is
+    # timed apart so framesPerSecond only holds RendererCv.update and show, the best of _repeats runs is kept like in TimeCalls
+    best = None
+    for i in range(_repeats):
+        scene = CreateBenchmarkScene(_characters, _boxes, _useStaticBVH=True)
+        renderer = RendererCv(_2d=False, _windowShape=Vec(1020, 720), _cameraPosition=Vec(0, 0, -500), _cameraRotation=Vec(0, -0.5, 0), _showWindow=False)
+        renderSeconds = 0
+        stepSeconds = 0
+        for j in range(_calls):
+            start = time.perf_counter()
+            scene.step(0.001)
+            stepped = time.perf_counter()
+            renderer.update(scene)
+            renderer.show()
+            renderSeconds += time.perf_counter() - stepped
+            stepSeconds += stepped - start
+        renderer.close()
+        if best == None or renderSeconds < best[0]:
+            # the sum of the last frame, equal between runs as long as the drawing is unchanged
+            best = (renderSeconds, stepSeconds, int(renderer.lastFrame.sum()))
+    renderSeconds, stepSeconds, checksum = best
+    return {"frames": _calls, "seconds": renderSeconds, "framesPerSecond": _calls / renderSeconds, "stepSeconds": stepSeconds, "checksum": checksum}
+
+def RunBenchmarks(_sizes, _cases, _calls):
+    results = []
+    for characters, boxes in _sizes:
+        size = {"characters": characters, "boxes": boxes}
+        if "step" in _cases:
+            for mode in SCENE_MODES:
+                results.append(dict(case="step", mode=mode, **size, **BenchmarkStep(characters, boxes, mode, _calls)))
+        if "query" in _cases:
+            results.append(dict(case="query", **size, **BenchmarkQueries(characters, boxes, _calls)))
+        if "render" in _cases:
+            results.append(dict(case="render", **size, **BenchmarkRender(characters, boxes, _calls)))
+    if "boundingRect" in _cases:
+        results.append(dict(case="boundingRect", **BenchmarkBoundingRect(_calls * 100)))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="headless benchmarks of PyPhyEngine")
+    parser.add_argument("--quick", action="store_true", help="small scenes and short timings, for ci")
+    parser.add_argument("--case", action="append", choices=["step", "query", "boundingRect", "render"], help="only run these cases")
+    parser.add_argument("--calls", type=int, default=None, help="calls timed per measurement")
+    parser.add_argument("--output", default=None, help="file to write the json results to, stdout if not given")
+    arguments = parser.parse_args()
+
+    sizes = [(1, 4), (10, 20)] if arguments.quick else [(1, 4), (10, 20), (50, 100)]
+    calls = arguments.calls if arguments.calls != None else (20 if arguments.quick else 200)
+    cases = arguments.case if arguments.case != None else ["step", "query", "boundingRect", "render"]
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "calls": calls,
+        "results": RunBenchmarks(sizes, cases, calls),
+    }
+    if arguments.output != None:
+        with open(arguments.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,194 @@
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from PyPhyEngine import Scene, Entity, EntityPhysics, EntityStateStore, Vec, LoadSceneSnapshot
+from run_benchmarks import SCENE_MODES, CreateCharacter, CreateBenchmarkScene
+
+# Headless checks of behaviour the benchmarks only time, every check runs in all scene modes and the reference mode
+# usage: python run_checks.py [--check fixedGeometry ...], exits with 1 when a check failed
+
+CHECK_MODES = dict(SCENE_MODES, reference={"_useBatchQueries": False}, spatialHashStateStore={"_useSpatialHash": True, "_useStateStore": True})
+
+# drops a character onto a ground that gets changed by _change(ground, platform) after the first step, the platform is a fixed entity
+# above the ground without hitboxes, returns the height and blockedDown of the character at rest
+def DropOnChangedGround(_mode, _change):
+    scene = Scene(_id=0, _gravity=Vec(0, 3, 0), **CHECK_MODES[_mode])
+    ground = Entity(_name="ground", _id=0, _position=Vec(0, 300, 0), _physics=EntityPhysics(_fixed=True, _friction=Vec(3, 0, 3)))
+    ground.createHitBox(Vec(600, 20, 600))
+    scene.addEntity(ground)
+    platform = Entity(_name="platform", _id=2, _position=Vec(0, 100, 0), _physics=EntityPhysics(_fixed=True))
+    scene.addEntity(platform)
+    character = CreateCharacter(1, Vec(0, -200, 0))
+    scene.addEntity(character)
+
+    scene.step(0.001)   # builds the lazy indices
+    _change(ground, platform)
+    for i in range(1500):
+        scene.step(0.001)
+    return character.position.y, character.blockedDown
+
+def CheckFixedGeometry(_mode):
+    # hitboxes of a fixed entity edited, added or removed after the scene started are used by the next queries
+    # (the feet of the character reach 32.5 below its position, it rests within the probe offset above the top of the ground)
+    failures = []
+    changes = {
+        "unchanged": (lambda ground, platform: None, 290),
+        "edited": (lambda ground, platform: ground.hitBoxes[0].editHitBox(_relativePos=Vec(0, -100, 0)), 190),
+        "resized": (lambda ground, platform: ground.hitBoxes[0].editHitBox(_shape=Vec(600, 220, 600)), 190),
+        "added": (lambda ground, platform: ground.createHitBox(Vec(200, 20, 200), Vec(0, -150, 0)), 140),
+        "removed": (lambda ground, platform: [ground.createHitBox(Vec(200, 20, 200), Vec(0, -150, 0)), ground.removeHitBox(ground.hitBoxes[1])], 290),
+        "platform": (lambda ground, platform: platform.createHitBox(Vec(200, 20, 200)), 90),
+    }
+    for name, (change, groundTop) in changes.items():
+        y, blockedDown = DropOnChangedGround(_mode, change)
+        if not blockedDown or abs(y + 32.5 - groundTop) > 4:
+            failures.append("%s ground: character rests at y=%.2f (blockedDown %s), expected on the top at %d" % (name, y, blockedDown, groundTop))
+    return failures
+
+# drops a character at _x onto the rotated beam of run_test_scene.py, stepping _seconds at _ticksPerSecond, returns where it rests
+def DropOnBeam(_mode, _x, _ticksPerSecond, _useContinuousCollision, _seconds=2):
+    scene = Scene(_id=0, _gravity=Vec(0, 3, 0), _ticksPerSecond=_ticksPerSecond, _useContinuousCollision=_useContinuousCollision, **CHECK_MODES[_mode])
+    beam = Entity(_name="beam", _id=0, _position=Vec(-300, 190, 0), _physics=EntityPhysics(_fixed=True, _friction=Vec(3, 0, 3)))
+    beam.createHitBox(Vec(300, 10, 100), Vec(0, 0, 0), Vec(0, 0, 1))
+    scene.addEntity(beam)
+    character = CreateCharacter(1, Vec(_x, 0, 0))
+    scene.addEntity(character)
+    for i in range(int(_seconds * _ticksPerSecond)):
+        scene.step(1 / _ticksPerSecond)
+    return character.position
+
+def CheckSweptSlope(_mode):
+    # a character landing on a slope at a low tick rate with swept collision rests where it rests at 1000 ticks without sweeping.
+    # Only the probe mode is checked, "sat" blocks the direction of the dominant axis of the contact normal, so the steep beam is a wall there
+    failures = []
+    if CHECK_MODES[_mode].get("_collisionMode") == "sat":
+        return failures
+    for x in [-300, -250]:
+        expected = DropOnBeam(_mode, x, 1000, False)
+        position = DropOnBeam(_mode, x, 60, True)
+        if abs(position.x - expected.x) > 2 or abs(position.y - expected.y) > 2:
+            failures.append("x=%d: rests at (%.1f, %.1f) with 60 swept ticks, at (%.1f, %.1f) with 1000 ticks" % (x, position.x, position.y, expected.x, expected.y))
+    return failures
+
+# the state of all entities (position, rotation, velocity, blocked flags, asleep) as one array, compared bit for bit
+def GetSceneState(_scene):
+    return np.array([(gEntity.position.x, gEntity.position.y, gEntity.position.z, gEntity.rotation.x, gEntity.rotation.y, gEntity.rotation.z,
+                      gEntity.velocity.x, gEntity.velocity.y, gEntity.velocity.z, gEntity.asleep) + tuple([getattr(gEntity, name) for name in EntityStateStore.blockedNames])
+                     for gEntity in _scene.entities], np.float64)
+
+# the scene mode every mode has to step exactly like: no batch, no indices, the same collision mode
+def GetReferenceMode(_mode):
+    mode = {"_useBatchQueries": False}
+    if "_collisionMode" in CHECK_MODES[_mode]:
+        mode["_collisionMode"] = CHECK_MODES[_mode]["_collisionMode"]
+    return mode
+
+def CheckTrajectories(_mode, _steps=200, _sampleEvery=20):
+    # the broadphase indices, the batch queries, the state store and the contact cache only change how fast a scene steps, not the result
+    failures = []
+    scene = CreateBenchmarkScene(5, 10, **CHECK_MODES[_mode])
+    reference = CreateBenchmarkScene(5, 10, **GetReferenceMode(_mode))
+    for i in range(_steps):
+        scene.step(0.001)
+        reference.step(0.001)
+        if i % _sampleEvery == 0 and not np.array_equal(GetSceneState(scene), GetSceneState(reference)):
+            failures.append("step %d: the state differs from %s" % (i, GetReferenceMode(_mode)))
+            break
+    return failures
+
+def CheckSnapshots(_mode, _steps=100):
+    # a rollback in place, a rollback into a new scene and a loaded snapshot all continue bit identical to the scene they were taken from
+    failures = []
+    scene = CreateBenchmarkScene(5, 10, **CHECK_MODES[_mode])
+    scene.run(_steps, 0.001)
+    checkpoint = scene.checkpoint()
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "snapshot.npz")
+    scene.saveSnapshot(path)
+    scene.run(_steps, 0.001)
+    expected = GetSceneState(scene)
+
+    restored = {"rollback": scene, "new scene": Scene(_id=0, **scene.getConfig()), "snapshot": LoadSceneSnapshot(path)}
+    os.remove(path)
+    os.rmdir(directory)
+    for name, restoredScene in restored.items():
+        if name != "snapshot":
+            restoredScene.rollback(checkpoint)
+        restoredScene.run(_steps, 0.001)
+        if not np.array_equal(GetSceneState(restoredScene), expected):
+            failures.append("%s: the state differs after %d steps" % (name, _steps))
+    return failures
+
+# a contact as comparable tuple
+def GetContactKey(_contact):
+    return (_contact.otherEntity.id, _contact.hitBox.name, _contact.otherHitBox.name, _contact.direction, _contact.depth,
+            _contact.normal.x, _contact.normal.y, _contact.normal.z)
+
+def CheckContactCache(_mode, _steps=100):
+    # the cached contacts equal freshly tested ones in every tick
+    failures = []
+    scene = CreateBenchmarkScene(5, 10, **CHECK_MODES[_mode])
+    characters = [gEntity for gEntity in scene.entities if not scene.isFixedEntity(gEntity)]
+    for i in range(_steps):
+        scene.step(0.001)
+        for gEntity in characters:
+            for fixedOnly in [True, False]:
+                cached = [GetContactKey(contact) for contact in scene.getCachedEntityContacts(gEntity, fixedOnly)]
+                tested = [GetContactKey(contact) for contact in scene.getEntityContacts(gEntity, fixedOnly)]
+                if cached != tested:
+                    failures.append("step %d: the cached contacts of %s differ" % (i, gEntity.name))
+                    return failures
+    return failures
+
+# the result of a query as comparable lists, hitboxes by name
+def GetQueryKey(_result):
+    return [[hBox.name for hBox in part] if isinstance(part, list) else np.asarray(part, object).ravel().tolist() for part in _result]
+
+def CheckQueries(_mode):
+    # raycasts and overlap queries find the same hitboxes as in the reference mode, small and large (most of the scene) regions
+    failures = []
+    scene = CreateBenchmarkScene(5, 10, **CHECK_MODES[_mode])
+    reference = CreateBenchmarkScene(5, 10, **GetReferenceMode(_mode))
+    scene.run(50, 0.001)
+    reference.run(50, 0.001)
+    origins = [Vec(x, -200, z) for x in range(-600, 601, 150) for z in [-100, 0, 100]]
+    queries = {
+        "raycast": lambda target: target.raycast(origins, [Vec(0.1, 1, 0)] * len(origins), 1000),
+        "overlapBox": lambda target: target.overlapBox(origins, Vec(100, 300, 100), Vec(0, 0.3, 0)),
+        "overlapSphere": lambda target: target.overlapSphere(origins, 250),
+        "overlapSphere large": lambda target: target.overlapSphere([Vec(0, 0, 0)], 5000),
+    }
+    for name, query in queries.items():
+        if GetQueryKey(query(scene)) != GetQueryKey(query(reference)):
+            failures.append("%s: the result differs from %s" % (name, GetReferenceMode(_mode)))
+    return failures
+
+CHECKS = {
+    "fixedGeometry": CheckFixedGeometry,
+    "sweptSlope": CheckSweptSlope,
+    "trajectories": CheckTrajectories,
+    "snapshots": CheckSnapshots,
+    "contactCache": CheckContactCache,
+    "queries": CheckQueries,
+}
+
+def RunChecks(_checks):
+    failed = 0
+    for name in _checks:
+        for mode in CHECK_MODES:
+            failures = CHECKS[name](mode)
+            print("%s %s %s" % ("FAIL" if len(failures) != 0 else "ok", name, mode))
+            for failure in failures:
+                print("    " + failure)
+            failed += len(failures) != 0
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="headless behaviour checks of PyPhyEngine")
+    parser.add_argument("--check", action="append", choices=list(CHECKS), help="only run these checks")
+    arguments = parser.parse_args()
+    sys.exit(1 if RunChecks(arguments.check or list(CHECKS)) != 0 else 0)